@@ -0,0 +1,167 @@
+"""
+Admission control and rate limiting for agent turns in the CORS proxy.
+
+Every agent turn ends in one or more slow model calls, so the proxy caps how
+many it sends upstream instead of letting a burst pile onto ADK and the
+Gemini quota. Each turn must pass, in order:
+
+1. the caller's concurrency limit (``ADMISSION_MAX_PER_USER``) - 429;
+2. the caller's token bucket (``RATE_LIMIT_PER_USER`` turns/second with a
+   burst of ``RATE_LIMIT_BURST``) - 429, and the optional global bucket - 503;
+3. the global concurrency limit (``ADMISSION_MAX_CONCURRENT``). Turns over the
+   limit wait in a queue of at most ``ADMISSION_QUEUE_SIZE`` for up to
+   ``ADMISSION_QUEUE_TIMEOUT`` seconds - 503 when the queue is full or the
+   wait times out.
+
+A turn rejected after taking tokens gives them back, so shed turns do not use
+up the caller's rate budget. Rejections carry a ``Retry-After`` estimate, and all decisions are counted
+for the proxy's ``/metrics`` endpoint.
+"""
+
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from token_bucket import TokenBucket
+
+ADMISSION_MAX_CONCURRENT = int(os.environ.get("ADMISSION_MAX_CONCURRENT", "32"))
+ADMISSION_MAX_PER_USER = int(os.environ.get("ADMISSION_MAX_PER_USER", "2"))
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "10"))
+RATE_LIMIT_PER_USER = float(os.environ.get("RATE_LIMIT_PER_USER", "0.5"))
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "5"))
+RATE_LIMIT_GLOBAL = float(os.environ.get("RATE_LIMIT_GLOBAL", "0"))  # 0 disables
+
+# Idle per-user buckets are dropped once there are this many
+MAX_TRACKED_USERS = 10000
+
+
+class Rejected(Exception):
+    """Raised when a turn is shed; maps directly onto the HTTP response."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """Global and per-user concurrency limits with a bounded wait queue."""
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+                 max_per_user: int = ADMISSION_MAX_PER_USER,
+                 queue_size: int = ADMISSION_QUEUE_SIZE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+                 user_rate: float = RATE_LIMIT_PER_USER,
+                 user_burst: float = RATE_LIMIT_BURST,
+                 global_rate: float = RATE_LIMIT_GLOBAL):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self._global_bucket = TokenBucket(global_rate, max(global_rate, 1)) if global_rate > 0 else None
+        self._user_buckets: Dict[str, TokenBucket] = {}
+        self._user_active: Dict[str, int] = {}
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        # Smoothed turn duration, used for Retry-After estimates
+        self.avg_duration = 5.0
+        self.stats = {
+            "admitted": 0, "queued": 0, "rate_limited": 0, "user_concurrency": 0,
+            "queue_full": 0, "queue_timeout": 0, "peak_active": 0, "peak_waiting": 0,
+        }
+
+    def _user_bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            if len(self._user_buckets) >= MAX_TRACKED_USERS:
+                for key in [k for k, b in self._user_buckets.items()
+                            if b.idle and not self._user_active.get(k)]:
+                    del self._user_buckets[key]
+            bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    def _reject(self, status_code: int, stat: str, reason: str, retry_after: float) -> Rejected:
+        self.stats[stat] += 1
+        return Rejected(status_code, reason, retry_after)
+
+    def _queue_retry_after(self) -> float:
+        return self.avg_duration * (self.waiting + 1) / self.max_concurrent
+
+    def _check_rate(self, user_id: str) -> None:
+        if self.user_rate > 0:
+            wait = self._user_bucket(user_id).try_acquire()
+            if wait:
+                raise self._reject(429, "rate_limited", "Too many requests for this user", wait)
+        if self._global_bucket is not None:
+            wait = self._global_bucket.try_acquire()
+            if wait:
+                if self.user_rate > 0:
+                    self._user_bucket(user_id).refund()
+                raise self._reject(503, "rate_limited", "Service is at its request rate limit", wait)
+
+    def _refund_rate(self, user_id: str) -> None:
+        if self.user_rate > 0:
+            self._user_bucket(user_id).refund()
+        if self._global_bucket is not None:
+            self._global_bucket.refund()
+
+    @asynccontextmanager
+    async def admit(self, user_id: Optional[str]) -> AsyncIterator[None]:
+        """Hold an upstream slot for the duration of the block, or raise Rejected."""
+        user_id = user_id or "anonymous"
+        if self.max_per_user and self._user_active.get(user_id, 0) >= self.max_per_user:
+            raise self._reject(429, "user_concurrency", "Too many concurrent requests for this user",
+                               self.avg_duration)
+
+        self._check_rate(user_id)
+
+        if self._slots.locked():
+            if self.waiting >= self.queue_size:
+                self._refund_rate(user_id)
+                raise self._reject(503, "queue_full", "Server is busy", self._queue_retry_after())
+            self.stats["queued"] += 1
+            self.waiting += 1
+            self.stats["peak_waiting"] = max(self.stats["peak_waiting"], self.waiting)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._refund_rate(user_id)
+                raise self._reject(503, "queue_timeout", "Server is busy", self._queue_retry_after())
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+
+        self.active += 1
+        self._user_active[user_id] = self._user_active.get(user_id, 0) + 1
+        self.stats["admitted"] += 1
+        self.stats["peak_active"] = max(self.stats["peak_active"], self.active)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.avg_duration = 0.9 * self.avg_duration + 0.1 * (time.monotonic() - started)
+            self.active -= 1
+            remaining = self._user_active[user_id] - 1
+            if remaining:
+                self._user_active[user_id] = remaining
+            else:
+                del self._user_active[user_id]
+            self._slots.release()
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "avg_turn_seconds": round(self.avg_duration, 2),
+            **self.stats,
+        }
@@ -3,97 +3,64 @@
 
 """
 Simplified ADK agent for SAP Doc scheduling assistant using direct Google API key
+
+``root_agent`` is created on first access rather than at import.
 """
 
 import os
 import logging
-import psycopg2
-import psycopg2.extras
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Dict, Optional, Any
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from holds import (
+    BOOK_UNLESS_HELD_QUERY,
+    HELD_BY_OTHERS_QUERY,
+    PLACE_HOLD_QUERY,
+    RELEASE_HOLD_QUERY,
+    SLOT_HOLD_MAX_PER_SESSION,
+    SLOT_HOLD_SECONDS,
+    TRIM_HOLDS_QUERY,
+    current_hold_owner,
+)
+from scheduling import (
+    AVAILABLE_TIME_SLOTS,
+    MAX_RETURNED_SLOTS,
+    OFFICE_HOURS,
+    compute_available_slots,
+    create_slot_id,
+    default_end_date,
+    expand_dates,
+    format_time_12h,
+    normalize_patient_name,
+    parse_natural_date_time,
+    split_slot_id,
+    parse_smart_date_time,
+)
+
 logger = logging.getLogger(__name__)
 
-# Set Google API key from environment
-os.environ['GOOGLE_API_KEY'] = os.getenv('GOOGLE_API_KEY', '')
-os.environ['GOOGLE_GENAI_USE_VERTEXAI'] = '0'  # Use direct API, not Vertex AI
+# psycopg2 and Google ADK are imported on first use: importing this module for
+# its helpers stays cheap, and root_agent is only built when ADK asks for it.
 
-# Available time slots configuration
-AVAILABLE_TIME_SLOTS = [
-    "09:00", "09:30", "10:00", "10:30", "11:00", "11:30",
-    "14:00", "14:30", "15:00", "15:30", "16:00", "16:30"
-]
+def get_db_connection(connect_timeout: Optional[float] = None, readonly: bool = False,
+                      primary: bool = False):
+    """db.get_db_connection, loading the database layer on the first query."""
+    import db
+    return db.get_db_connection(connect_timeout=connect_timeout, readonly=readonly, primary=primary)
 
-OFFICE_HOURS = {
-    "start": "09:00",
-    "end": "17:00",
-    "days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-}
-
-# DRY: Single function to handle slot ID format consistently
-def create_slot_id(date_str: str, time_str: str) -> str:
-    """Create a standardized slot ID from date and time."""
-    return f"{date_str}-{time_str}"
-
-def parse_slot_id(slot_id: str) -> tuple[str, str]:
-    """Parse a slot ID into date and time components.
-    Always returns valid date_str, time_str - uses defaults if parsing fails.
-    """
-    try:
-        parts = slot_id.split('-')
-        logger.info(f"Parsing slot_id '{slot_id}', parts: {parts}, length: {len(parts)}")
-        
-        if len(parts) == 4:
-            # Format: YYYY-MM-DD-HH:MM
-            date_str = f"{parts[0]}-{parts[1]}-{parts[2]}"
-            time_str = parts[3]
-            logger.info(f"Matched format 1: date_str='{date_str}', time_str='{time_str}'")
-            return date_str, time_str
-        elif len(parts) == 5:
-            # Legacy format: YYYY-MM-DD-HH-MM
-            date_str = f"{parts[0]}-{parts[1]}-{parts[2]}"
-            time_str = f"{parts[3]}:{parts[4]}"
-            logger.info(f"Matched format 2: date_str='{date_str}', time_str='{time_str}'")
-            return date_str, time_str
-        else:
-            # Invalid format - use defaults
-            logger.info(f"Invalid slot ID format '{slot_id}' with {len(parts)} parts, using defaults")
-            today = datetime.now()
-            return today.strftime('%Y-%m-%d'), "10:00"
-    except Exception as e:
-        # Any parsing error - use defaults
-        logger.info(f"Error parsing slot ID '{slot_id}': {e}, using defaults")
-        today = datetime.now()
-        return today.strftime('%Y-%m-%d'), "10:00"
-
-# Database connection
-def get_db_connection():
-    """Get database connection using environment variables."""
-    try:
-        conn = psycopg2.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            database=os.getenv('DB_NAME', 'sap_doc_app'),
-            user=os.getenv('DB_USER', 'kade'),
-            password=os.getenv('DB_PASSWORD', 'password123'),
-            port=os.getenv('DB_PORT', '5432')
-        )
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        raise
+def dict_cursor(conn):
+    """Cursor returning rows as dicts, traced like every other query."""
+    from db import TracedRealDictCursor
+    return conn.cursor(cursor_factory=TracedRealDictCursor)
 
 def get_available_slots(start_date: str, end_date: Optional[str] = None) -> List[Dict[str, Any]]:
     """Get available appointment slots for a date range."""
     try:
         if not end_date:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            end_dt = start_dt + timedelta(days=14)
-            end_date = end_dt.strftime('%Y-%m-%d')
+            end_date = default_end_date(start_date)
         
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        conn = get_db_connection(readonly=True)
+        cursor = dict_cursor(conn)
         
         query = "SELECT * FROM appointments WHERE date BETWEEN %s AND %s"
         cursor.execute(query, (start_date, end_date))
@@ -102,8 +69,18 @@ def get_available_slots(start_date: str, end_date: Optional[str] = None) -> List
         cursor.close()
         conn.close()
         
+        # Slots other sessions are holding are not offered either. Holds last
+        # minutes, so they are read from the primary rather than a lagging replica
+        conn = get_db_connection(readonly=True, primary=True)
+        cursor = dict_cursor(conn)
+        cursor.execute(HELD_BY_OTHERS_QUERY, (start_date, end_date, current_hold_owner()))
+        held = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        
         # Create set of booked slots
-        booked_slots = set()
+        booked_slots = {row['slot_id'] for row in held}
         for appointment in appointments:
             slot_id = create_slot_id(
                 appointment['date'].strftime('%Y-%m-%d'), 
@@ -111,39 +88,10 @@ def get_available_slots(start_date: str, end_date: Optional[str] = None) -> List
             )
             booked_slots.add(slot_id)
         
-        # Generate available slots
-        available_slots = []
-        current_date = datetime.strptime(start_date, '%Y-%m-%d')
-        end_date_dt = datetime.strptime(end_date, '%Y-%m-%d')
-        
-        while current_date <= end_date_dt and len(available_slots) < 20:
-            if current_date.weekday() < 5:  # Monday = 0, Friday = 4
-                date_str = current_date.strftime('%Y-%m-%d')
-                
-                for time_slot in AVAILABLE_TIME_SLOTS:
-                    slot_id = create_slot_id(date_str, time_slot)
-                    
-                    if slot_id not in booked_slots:
-                        now = datetime.now()
-                        if current_date.date() == now.date():
-                            slot_datetime = datetime.strptime(f"{date_str} {time_slot}", '%Y-%m-%d %H:%M')
-                            if slot_datetime <= now:
-                                continue
-                        
-                        available_slots.append({
-                            "slot_id": slot_id,
-                            "date": date_str,
-                            "time": time_slot,
-                            "day_name": current_date.strftime('%A'),
-                            "formatted_date": current_date.strftime('%B %d, %Y')
-                        })
-            
-            current_date += timedelta(days=1)
-        
-        return available_slots[:10]
+        return compute_available_slots(start_date, end_date, booked_slots)
         
     except Exception as error:
-        logger.error(f"Error getting available slots: {error}")
+        logger.error("Error getting available slots: %s", error)
         return []
 
 def find_nearest_available_slot(start_date: Optional[str] = None) -> Optional[Dict[str, Any]]:
@@ -154,41 +102,76 @@ def find_nearest_available_slot(start_date: Optional[str] = None) -> Optional[Di
     available_slots = get_available_slots(start_date)
     return available_slots[0] if available_slots else None
 
+def answer_from_prefetch(tool, args, tool_context) -> Optional[Dict[str, Any]]:
+    """Before-tool callback answering availability lookups from the prefetched snapshot."""
+    if tool.name not in ("get_available_slots", "find_nearest_available_slot"):
+        return None
+    from prefetch import fresh_availability
+    snapshot = fresh_availability(tool_context.state)
+    if snapshot is None:
+        return None
+    try:
+        start_date = args.get("start_date") or datetime.now().strftime('%Y-%m-%d')
+        end_date = args.get("end_date") or default_end_date(start_date)
+        if start_date < snapshot["start"]:
+            return None
+        unavailable = set(snapshot["booked"])
+        unavailable.update(slot_id for slot_id, session_id in snapshot.get("holds", [])
+                           if session_id != tool_context.session.id)
+        slots = compute_available_slots(start_date, min(end_date, snapshot["end"]), unavailable)
+    except ValueError:
+        return None
+    # Past the snapshot's window the answer is only complete if the slot limit was already reached
+    if end_date > snapshot["end"] and len(slots) < MAX_RETURNED_SLOTS:
+        return None
+    if tool.name == "find_nearest_available_slot":
+        return slots[0] if slots else {"result": None}
+    return {"result": slots}
+
 def book_appointment_slot(slot_id: str, patient_name: str, description: str = "") -> str:
-    """Book an appointment slot - Force insert mode for testing."""
+    """Book an appointment slot."""
     try:
-        logger.info(f"🔍 book_appointment_slot called with: slot_id='{slot_id}', patient_name='{patient_name}', description='{description}'")
+        logger.debug("🔍 book_appointment_slot called with: slot_id=%r, patient_name=%r, description=%r",
+                     slot_id, patient_name, description)
         
-        # Parse slot ID - now always returns valid values
-        date_str, time_str = parse_slot_id(slot_id)
-        logger.info(f"📅 Parsed result: date_str='{date_str}', time_str='{time_str}'")
+        parsed = split_slot_id(slot_id)
+        if parsed is None:
+            logger.info("Invalid slot_id format: %r", slot_id)
+            return "Invalid slot ID format. Please try again."
+        date_str, time_str = parsed
+        logger.debug("📅 Parsed result: date_str=%r, time_str=%r", date_str, time_str)
         
         # Create a standardized slot_id for database consistency
         standardized_slot_id = create_slot_id(date_str, time_str)
-        logger.info(f"🔧 Standardized slot_id: '{standardized_slot_id}'")
+        logger.debug("🔧 Standardized slot_id: %r", standardized_slot_id)
         
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Check if slot is already booked
-        check_query = "SELECT * FROM appointments WHERE slot_id = %s"
-        cursor.execute(check_query, (standardized_slot_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
+        # Book the appointment unless it is taken or another patient is
+        # confirming it, converting this session's hold; one statement, so a
+        # hold placed meanwhile cannot slip between the check and the insert
+        cursor.execute(BOOK_UNLESS_HELD_QUERY, (
+            standardized_slot_id, time_str, date_str, patient_name, description,
+            standardized_slot_id, current_hold_owner(),
+        ))
+        if cursor.fetchone() is None:
+            conn.rollback()
+            # The date lets Postgres skip other months' partitions
+            check_query = "SELECT 1 FROM appointments WHERE slot_id = %s AND date = %s"
+            cursor.execute(check_query, (standardized_slot_id, date_str))
+            existing = cursor.fetchone()
             cursor.close()
             conn.close()
-            logger.info(f"❌ Slot {standardized_slot_id} already booked")
-            return f"Sorry, the appointment slot for {date_str} at {format_time_12h(time_str)} is already booked. Please choose a different time slot."
+            if existing:
+                logger.info("❌ Slot %s already booked", standardized_slot_id)
+                return f"Sorry, the appointment slot for {date_str} at {format_time_12h(time_str)} is already booked. Please choose a different time slot."
+            logger.info("❌ Slot %s held by another session", standardized_slot_id)
+            return f"Sorry, the appointment slot for {date_str} at {format_time_12h(time_str)} is being held for another patient. Please choose a different time slot."
         
-        # Force book the appointment
-        insert_query = """
-            INSERT INTO appointments (slot_id, time, date, patient_name, description) 
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (standardized_slot_id, time_str, date_str, patient_name, description))
+        cursor.execute(RELEASE_HOLD_QUERY, (standardized_slot_id,))
         conn.commit()
-        logger.info(f"✅ Successfully inserted appointment into database")
+        logger.info("✅ Booked appointment %s", standardized_slot_id)
         
         cursor.close()
         conn.close()
@@ -200,17 +183,69 @@ def book_appointment_slot(slot_id: str, patient_name: str, description: str = ""
         return f"✅ Appointment successfully booked!\n\nDetails:\n- Patient: {patient_name}\n- Date: {formatted_date} ({day_name})\n- Time: {format_time_12h(time_str)}\n- Appointment ID: {standardized_slot_id}\n\nPlease arrive 15 minutes early. You will receive a confirmation email shortly."
         
     except Exception as error:
-        logger.error(f"💥 Error booking appointment: {error}")
+        logger.error("💥 Error booking appointment: %s", error)
         return f"❌ Unable to book appointment due to a system error: {str(error)}. Please try again or contact our office directly."
 
+def hold_appointment_slot(slot_id: str) -> str:
+    """Hold a slot for this patient while they confirm the booking details.
+
+    Call this as soon as the patient picks a slot, before asking them to
+    confirm. Other patients cannot book a held slot until the hold expires or
+    this patient books it with book_appointment_slot.
+    """
+    owner = current_hold_owner()
+    if not owner:
+        return "Slots can only be held during a chat session."
+    try:
+        parsed = split_slot_id(slot_id)
+        if parsed is None:
+            logger.info("Invalid slot_id format: %r", slot_id)
+            return "Invalid slot ID format. Please try again."
+        date_str, time_str = parsed
+        standardized_slot_id = create_slot_id(date_str, time_str)
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT 1 FROM appointments WHERE slot_id = %s AND date = %s", (standardized_slot_id, date_str))
+        if cursor.fetchone():
+            cursor.close()
+            conn.close()
+            return f"Sorry, the appointment slot for {date_str} at {format_time_12h(time_str)} is already booked. Please choose a different time slot."
+        
+        cursor.execute(PLACE_HOLD_QUERY, (standardized_slot_id, date_str, owner, SLOT_HOLD_SECONDS))
+        if cursor.fetchone() is None:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return f"Sorry, the appointment slot for {date_str} at {format_time_12h(time_str)} is being held for another patient. Please choose a different time slot."
+        cursor.execute(TRIM_HOLDS_QUERY, (owner, owner, SLOT_HOLD_MAX_PER_SESSION))
+        conn.commit()
+        
+        cursor.close()
+        conn.close()
+        
+        minutes = max(SLOT_HOLD_SECONDS // 60, 1)
+        return f"The slot on {date_str} at {format_time_12h(time_str)} (Appointment ID: {standardized_slot_id}) is held for {minutes} minutes while the patient confirms."
+        
+    except Exception as error:
+        logger.error("Error holding appointment slot: %s", error)
+        return "Unable to hold the slot right now; it can still be booked directly."
+
 def cancel_appointment_by_slot(slot_id: str) -> str:
     """Cancel an appointment by slot ID."""
     try:
+        # Slot IDs start with the appointment date, which selects the partition
+        parsed = split_slot_id(slot_id)
+        if parsed is None:
+            return "No appointment found with that slot ID."
+        slot_date, _ = parsed
+        
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = dict_cursor(conn)
         
-        check_query = "SELECT * FROM appointments WHERE slot_id = %s"
-        cursor.execute(check_query, (slot_id,))
+        check_query = "SELECT * FROM appointments WHERE slot_id = %s AND date = %s"
+        cursor.execute(check_query, (slot_id, slot_date))
         appointment = cursor.fetchone()
         
         if not appointment:
@@ -218,8 +253,8 @@ def cancel_appointment_by_slot(slot_id: str) -> str:
             conn.close()
             return "No appointment found with that slot ID."
         
-        delete_query = "DELETE FROM appointments WHERE slot_id = %s"
-        cursor.execute(delete_query, (slot_id,))
+        delete_query = "DELETE FROM appointments WHERE slot_id = %s AND date = %s"
+        cursor.execute(delete_query, (slot_id, slot_date))
         conn.commit()
         
         cursor.close()
@@ -229,14 +264,22 @@ def cancel_appointment_by_slot(slot_id: str) -> str:
         return f"Appointment for {appointment['patient_name']} on {date_str} at {format_time_12h(appointment['time'])} has been cancelled."
         
     except Exception as error:
-        logger.error(f"Error cancelling appointment: {error}")
+        logger.error("Error cancelling appointment: %s", error)
         return "Unable to cancel appointment. Please try again."
 
+def _day_appointment(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "slot_id": row['slot_id'],
+        "time": row['time'],
+        "patient_name": row['patient_name'],
+        "description": row['description']
+    }
+
 def get_appointments_for_date(date: str) -> List[Dict[str, Any]]:
     """Get all appointments for a specific date."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        conn = get_db_connection(readonly=True)
+        cursor = dict_cursor(conn)
         
         query = "SELECT * FROM appointments WHERE date = %s ORDER BY time"
         cursor.execute(query, (date,))
@@ -245,26 +288,52 @@ def get_appointments_for_date(date: str) -> List[Dict[str, Any]]:
         cursor.close()
         conn.close()
         
-        result = []
-        for row in appointments:
-            result.append({
-                "slot_id": row['slot_id'],
-                "time": row['time'],
-                "patient_name": row['patient_name'],
-                "description": row['description']
-            })
+        return [_day_appointment(row) for row in appointments]
         
+    except Exception as error:
+        logger.error("Error getting appointments: %s", error)
+        return []
+
+def get_appointments_for_dates(dates: List[str]) -> Dict[str, Any]:
+    """Get all appointments for several dates in one lookup.
+
+    Each entry of dates is a date (YYYY-MM-DD) or an inclusive range
+    (YYYY-MM-DD..YYYY-MM-DD). Use this instead of calling
+    get_appointments_for_date once per day. Returns the appointments grouped
+    by date, in the same form as get_appointments_for_date; days with no
+    appointments map to an empty list.
+    """
+    try:
+        days = expand_dates(dates)
+    except ValueError as error:
+        return {"error": f"{error}. Use YYYY-MM-DD dates or YYYY-MM-DD..YYYY-MM-DD ranges."}
+    result: Dict[str, Any] = {day: [] for day in days}
+    if not days:
+        return result
+    try:
+        conn = get_db_connection(readonly=True)
+        cursor = dict_cursor(conn)
+        
+        query = "SELECT * FROM appointments WHERE date = ANY(%s::date[]) ORDER BY date, time"
+        cursor.execute(query, (days,))
+        appointments = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        
+        for row in appointments:
+            result[row['date'].strftime('%Y-%m-%d')].append(_day_appointment(row))
         return result
         
     except Exception as error:
-        logger.error(f"Error getting appointments: {error}")
-        return []
+        logger.error("Error getting appointments for dates: %s", error)
+        return {"error": "Unable to look up appointments. Please try again."}
 
 def get_all_booked_appointments() -> List[Dict[str, Any]]:
     """Get all booked appointments."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        conn = get_db_connection(readonly=True)
+        cursor = dict_cursor(conn)
         
         query = "SELECT * FROM appointments ORDER BY date, time"
         cursor.execute(query)
@@ -289,7 +358,82 @@ def get_all_booked_appointments() -> List[Dict[str, Any]]:
         return result
         
     except Exception as error:
-        logger.error(f"Error getting booked appointments: {error}")
+        logger.error("Error getting booked appointments: %s", error)
+        return []
+
+# Most matches returned by a patient search
+PATIENT_SEARCH_LIMIT = 20
+
+def _appointment_summary(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "slot_id": row['slot_id'],
+        "date": row['date'].strftime('%Y-%m-%d'),
+        "time": row['time'],
+        "patient_name": row['patient_name'],
+        "description": row['description'],
+        "formatted_date": row['date'].strftime('%B %d, %Y'),
+        "day_name": row['date'].strftime('%A')
+    }
+
+def find_appointments_by_patient(patient_name: str) -> List[Dict[str, Any]]:
+    """Find a patient's upcoming appointments by name.
+
+    Use this to get the slot_id for cancelling or rescheduling instead of
+    listing every booked appointment. Names are matched case-insensitively by
+    prefix ("jane" finds "Jane Doe"); if nothing matches, similar names are
+    returned to allow for typos. Each result has a "match" field saying how
+    it was found ("prefix", "fuzzy" or "substring").
+    """
+    from psycopg2.errors import UndefinedFunction
+    name = normalize_patient_name(patient_name)
+    if not name:
+        return []
+    columns = "slot_id, date, time, patient_name, description"
+    try:
+        conn = get_db_connection(readonly=True)
+        cursor = dict_cursor(conn)
+        
+        # Prefix match, served by the lower(patient_name) text_pattern_ops index
+        prefix = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        cursor.execute(
+            f"SELECT {columns} FROM appointments "
+            "WHERE lower(patient_name) LIKE %s AND date >= CURRENT_DATE "
+            "ORDER BY date, time LIMIT %s",
+            (prefix, PATIENT_SEARCH_LIMIT)
+        )
+        rows = cursor.fetchall()
+        match = "prefix"
+        
+        if not rows:
+            # Fuzzy match on any part of the name, served by the pg_trgm GIN index
+            match = "fuzzy"
+            try:
+                cursor.execute(
+                    f"SELECT {columns} FROM appointments "
+                    "WHERE lower(patient_name) %% %s AND date >= CURRENT_DATE "
+                    "ORDER BY similarity(lower(patient_name), %s) DESC, date, time LIMIT %s",
+                    (name, name, PATIENT_SEARCH_LIMIT)
+                )
+                rows = cursor.fetchall()
+            except UndefinedFunction:
+                # pg_trgm is not installed; fall back to a substring scan
+                conn.rollback()
+                match = "substring"
+                cursor.execute(
+                    f"SELECT {columns} FROM appointments "
+                    "WHERE patient_name ILIKE %s AND date >= CURRENT_DATE "
+                    "ORDER BY date, time LIMIT %s",
+                    ("%" + prefix, PATIENT_SEARCH_LIMIT)
+                )
+                rows = cursor.fetchall()
+        
+        cursor.close()
+        conn.close()
+        
+        return [{**_appointment_summary(row), "match": match} for row in rows]
+        
+    except Exception as error:
+        logger.error("Error searching appointments for patient: %s", error)
         return []
 
 def get_office_info() -> Dict[str, Any]:
@@ -302,71 +446,10 @@ def get_office_info() -> Dict[str, Any]:
         "cancellation_policy": "24 hours notice preferred"
     }
 
-def format_time_12h(time_24h: str) -> str:
-    """Convert 24-hour time to 12-hour format."""
-    try:
-        time_obj = datetime.strptime(time_24h, '%H:%M')
-        return time_obj.strftime('%I:%M %p')
-    except:
-        return time_24h
-
 def send_appointment_reminder(patient_name: str, date: str, time: str) -> str:
     """Send appointment reminder (mock function)."""
     return f"Reminder sent to {patient_name} for appointment on {date} at {format_time_12h(time)}"
 
-def parse_natural_date_time(date_input: str, time_input: str) -> Optional[str]:
-    """Convert natural language date and time to standardized slot_id format."""
-    try:
-        # Handle various date formats
-        date_formats = [
-            '%Y-%m-%d',     # 2025-06-18
-            '%B %d, %Y',    # June 18, 2025
-            '%b %d, %Y',    # Jun 18, 2025
-            '%m/%d/%Y',     # 06/18/2025
-            '%d/%m/%Y',     # 18/06/2025
-        ]
-        
-        parsed_date = None
-        for date_format in date_formats:
-            try:
-                parsed_date = datetime.strptime(date_input.strip(), date_format)
-                break
-            except ValueError:
-                continue
-        
-        if not parsed_date:
-            logger.error(f"Could not parse date: {date_input}")
-            return None
-        
-        # Handle various time formats
-        time_formats = [
-            '%H:%M',        # 10:30
-            '%I:%M %p',     # 10:30 AM
-            '%I:%M%p',      # 10:30AM
-            '%I %p',        # 10 AM
-        ]
-        
-        parsed_time = None
-        for time_format in time_formats:
-            try:
-                parsed_time = datetime.strptime(time_input.strip(), time_format)
-                break
-            except ValueError:
-                continue
-        
-        if not parsed_time:
-            logger.error(f"Could not parse time: {time_input}")
-            return None
-        
-        # Create standardized slot ID
-        date_str = parsed_date.strftime('%Y-%m-%d')
-        time_str = parsed_time.strftime('%H:%M')
-        return create_slot_id(date_str, time_str)
-        
-    except Exception as e:
-        logger.error(f"Error parsing date/time: {e}")
-        return None
-
 def book_appointment_with_natural_language(date_input: str, time_input: str, patient_name: str, description: str = "") -> str:
     """Book an appointment using natural language date and time inputs."""
     try:
@@ -378,45 +461,20 @@ def book_appointment_with_natural_language(date_input: str, time_input: str, pat
         return book_appointment_slot(slot_id, patient_name, description)
         
     except Exception as error:
-        logger.error(f"Error booking appointment with natural language: {error}")
+        logger.error("Error booking appointment with natural language: %s", error)
         return "Unable to book appointment. Please try again or contact our office."
 
 def book_appointment_smart(date_time_input: str, patient_name: str, description: str = "") -> str:
     """Smart booking function that can parse various date/time formats from a single string."""
     try:
-        import re
-        
-        # Simple patterns for common formats
-        patterns = [
-            # "June 18, 2025 at 10:30 AM"
-            r'(\w+ \d{1,2},? \d{4}) at (\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))',
-            # "2025-06-18 10:30"
-            r'(\d{4}-\d{2}-\d{2})\s+(\d{1,2}:\d{2})',
-            # "June 18 at 10:30 AM"
-            r'(\w+\s+\d{1,2})\s+at\s+(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))',
-        ]
+        slot_id = parse_smart_date_time(date_time_input)
+        if slot_id:
+            return book_appointment_slot(slot_id, patient_name, description)
         
-        date_time_input = date_time_input.strip()
-        
-        for pattern in patterns:
-            match = re.search(pattern, date_time_input)
-            if match:
-                date_part = match.group(1)
-                time_part = match.group(2)
-                
-                # Add current year if missing
-                if not re.search(r'\d{4}', date_part):
-                    current_year = datetime.now().year
-                    date_part = f"{date_part}, {current_year}"
-                
-                slot_id = parse_natural_date_time(date_part, time_part)
-                if slot_id:
-                    return book_appointment_slot(slot_id, patient_name, description)
-        
-        return f"I couldn't parse the date and time from '{date_time_input}'. Please use formats like 'June 18, 2025 at 10:30 AM'."
+        return f"I couldn't parse the date and time from '{date_time_input.strip()}'. Please use formats like 'June 18, 2025 at 10:30 AM'."
         
     except Exception as error:
-        logger.error(f"Error in smart booking: {error}")
+        logger.error("Error in smart booking: %s", error)
         return "Unable to book appointment. Please try again."
 
 def force_insert_test_data() -> str:
@@ -454,8 +512,8 @@ def force_insert_test_data() -> str:
         for appointment in test_appointments:
             try:
                 # Check if already exists
-                check_query = "SELECT * FROM appointments WHERE slot_id = %s"
-                cursor.execute(check_query, (appointment["slot_id"],))
+                check_query = "SELECT * FROM appointments WHERE slot_id = %s AND date = %s"
+                cursor.execute(check_query, (appointment["slot_id"], appointment["date"]))
                 if cursor.fetchone():
                     continue  # Skip if already exists
                 
@@ -473,7 +531,7 @@ def force_insert_test_data() -> str:
                 ))
                 inserted_count += 1
             except Exception as e:
-                logger.error(f"Error inserting test appointment {appointment['slot_id']}: {e}")
+                logger.error("Error inserting test appointment %s: %s", appointment['slot_id'], e)
         
         conn.commit()
         cursor.close()
@@ -482,42 +540,94 @@ def force_insert_test_data() -> str:
         return f"✅ Successfully inserted {inserted_count} test appointments into the database for testing purposes."
         
     except Exception as error:
-        logger.error(f"Error inserting test data: {error}")
+        logger.error("Error inserting test data: %s", error)
         return f"❌ Failed to insert test data: {error}"
 
+# Tools of the patient-facing sap-doc-app agent
+PATIENT_TOOLS = [
+    get_available_slots,
+    find_nearest_available_slot,
+    hold_appointment_slot,
+    book_appointment_slot,
+    cancel_appointment_by_slot,
+    get_appointments_for_date,
+    get_appointments_for_dates,
+    get_all_booked_appointments,
+    find_appointments_by_patient,
+    get_office_info,
+    send_appointment_reminder,
+]
+
+# Booking experiments and test data, only on the development agent
+DEV_TOOLS = [
+    book_appointment_with_natural_language,
+    book_appointment_smart,
+    force_insert_test_data,
+]
+
 # Real ADK Agent - No simulation mode
-try:
-    from google.adk.agents import Agent
+def build_root_agent(tools: Optional[List[Any]] = None):
+    """Create the ADK agent with its callbacks and the given tools.
+
+    Defaults to PATIENT_TOOLS plus DEV_TOOLS; sap-doc-app passes PATIENT_TOOLS.
+    """
+    if tools is None:
+        tools = PATIENT_TOOLS + DEV_TOOLS
     
-    # Import instruction from prompts.py
-    from prompts import INSTRUCTION
+    # Set Google API key from environment
+    os.environ['GOOGLE_API_KEY'] = os.getenv('GOOGLE_API_KEY', '')
+    os.environ['GOOGLE_GENAI_USE_VERTEXAI'] = '0'  # Use direct API, not Vertex AI
     
-    root_agent = Agent(
-        model="gemini-2.0-flash-exp",  # Try different model
-        name="sap_doc_scheduling_assistant",
-        instruction=INSTRUCTION,
-        tools=[
-            get_available_slots,
-            find_nearest_available_slot,
-            book_appointment_slot,
-            book_appointment_with_natural_language,
-            book_appointment_smart,
-            cancel_appointment_by_slot,
-            get_appointments_for_date,
-            get_all_booked_appointments,
-            get_office_info,
-            send_appointment_reminder,
-            force_insert_test_data,
-        ],
+    from config import config
+    from db import record_db_writes, route_db_reads
+    from deadlines import check_tool_deadline, end_turn_deadline, report_tool_timeouts, start_turn_deadline
+    from holds import set_hold_owner
+    from history import bound_history
+    from model_tiering import end_turn, record_model_usage, route_model
+    from tracing import (
+        trace_after_agent,
+        trace_after_model,
+        trace_after_tool,
+        trace_before_agent,
+        trace_before_model,
+        trace_before_tool,
     )
     
-    logger.info("✅ Real ADK Agent created successfully")
-    
-except ImportError as e:
-    logger.error(f"❌ Google ADK not available: {e}")
-    logger.error("Install with: pip install google-adk google-cloud-aiplatform[adk]")
-    raise SystemExit("ADK is required - simulation mode removed")
-except Exception as e:
-    logger.error(f"❌ ADK Agent creation failed: {e}")
-    logger.error("Check your GOOGLE_API_KEY environment variable")
-    raise SystemExit("Failed to create ADK agent")
+    try:
+        from google.adk.agents import Agent
+        
+        # Import instruction from prompts.py
+        from prompts import INSTRUCTION
+        
+        agent = Agent(
+            model=config.agent_settings.model,
+            name=config.agent_settings.name,
+            instruction=INSTRUCTION,
+            tools=tools,
+            before_agent_callback=[start_turn_deadline, trace_before_agent],
+            after_agent_callback=[end_turn, end_turn_deadline, trace_after_agent],
+            before_model_callback=[bound_history, route_model, trace_before_model],
+            after_model_callback=[record_model_usage, trace_after_model],
+            before_tool_callback=[check_tool_deadline, route_db_reads, set_hold_owner, trace_before_tool,
+                                  answer_from_prefetch],
+            after_tool_callback=[record_db_writes, trace_after_tool, report_tool_timeouts],
+        )
+        
+        logger.info("✅ Real ADK Agent created successfully")
+        return agent
+        
+    except ImportError as e:
+        logger.error("❌ Google ADK not available: %s", e)
+        logger.error("Install with: pip install google-adk google-cloud-aiplatform[adk]")
+        raise SystemExit("ADK is required - simulation mode removed")
+    except Exception as e:
+        logger.error("❌ ADK Agent creation failed: %s", e)
+        logger.error("Check your GOOGLE_API_KEY environment variable")
+        raise SystemExit("Failed to create ADK agent")
+
+def __getattr__(name: str):
+    # root_agent is built on first access, e.g. when ADK's agent loader looks it up
+    if name == "root_agent":
+        globals()["root_agent"] = agent = build_root_agent()
+        return agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
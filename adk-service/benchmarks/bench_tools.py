@@ -0,0 +1,360 @@
+"""
+Micro-benchmarks for the scheduling agent's hot-path helpers.
+
+Runs each helper against synthetic appointment tables of different sizes and
+booking windows of different lengths, writes the results as JSON and compares
+them against a stored baseline. Also measures how long key modules take to
+import in a fresh interpreter and checks them against ``IMPORT_BUDGETS_MS``.
+
+Usage:
+    python benchmarks/bench_tools.py                      # run and compare
+    python benchmarks/bench_tools.py --save-baseline      # record a new baseline
+    python benchmarks/bench_tools.py --output out.json --fail-on-regression
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+import agent  # noqa: E402
+import scheduling  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Booked rows in the synthetic table (out of ~3100 weekday slots in a year)
+DATASET_SIZES = [0, 500, 1500, 3000]
+# Booking horizons in days passed to get_available_slots
+WINDOW_LENGTHS = [7, 14, 28, 56]
+HORIZON_DAYS = 365
+# Cold import budgets in milliseconds. The agent module must not pull in
+# psycopg2 or Google ADK until a tool runs or root_agent is built.
+IMPORT_BUDGETS_MS = {
+    "scheduling": 50,
+    "agent": 100,
+}
+
+
+class FakeCursor:
+    """Cursor that answers date-range queries from a pre-built table."""
+
+    def __init__(self, table: "FakeTable"):
+        self.table = table
+        self.rows: List[Dict[str, Any]] = []
+
+    def execute(self, query: str, params: Tuple = ()):
+        self.rows = self.table.select(query, params)
+        if self.table.executed is not None:
+            self.table.executed.append((query, len(self.rows)))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, table: "FakeTable"):
+        self.table = table
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self.table)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeTable:
+    """In-memory appointments table with memoised range lookups.
+
+    Query results are cached per parameter tuple so the benchmark measures the
+    Python work done on the rows, not the cost of filtering them here.
+    """
+
+    def __init__(self, size: int, start: datetime, seed: int = 42):
+        slots = []
+        day = start
+        for _ in range(HORIZON_DAYS):
+            if day.weekday() < 5:
+                for time_slot in agent.AVAILABLE_TIME_SLOTS:
+                    slots.append((day.date(), time_slot))
+            day += timedelta(days=1)
+
+        rng = random.Random(seed)
+        booked = sorted(rng.sample(slots, min(size, len(slots))))
+        self.rows = [
+            {
+                "slot_id": agent.create_slot_id(d.strftime('%Y-%m-%d'), t),
+                "date": d,
+                "time": t,
+                "patient_name": f"Patient {i}",
+                "description": "",
+            }
+            for i, (d, t) in enumerate(booked)
+        ]
+        self._cache: Dict[Tuple, List[Dict[str, Any]]] = {}
+        # (query, row count) of each statement while check_row_counts runs
+        self.executed = None
+
+    def select(self, query: str, params: Tuple) -> List[Dict[str, Any]]:
+        if "slot_holds" in query:
+            # The synthetic data has no holds
+            return []
+        key = tuple(params)
+        if key not in self._cache:
+            if len(key) == 2:
+                lo = datetime.strptime(key[0], '%Y-%m-%d').date()
+                hi = datetime.strptime(key[1], '%Y-%m-%d').date()
+                self._cache[key] = [r for r in self.rows if lo <= r["date"] <= hi]
+            else:
+                self._cache[key] = list(self.rows)
+        return self._cache[key]
+
+
+def check_row_counts(table: FakeTable, start_str: str, end_str: str) -> None:
+    """Check the fake returns the rows Postgres would for get_available_slots' queries."""
+    lo = datetime.strptime(start_str, '%Y-%m-%d').date()
+    hi = datetime.strptime(end_str, '%Y-%m-%d').date()
+    booked = sum(1 for r in table.rows if lo <= r["date"] <= hi)
+
+    table.executed = []
+    try:
+        agent.get_available_slots(start_str, end_str)
+        executed = table.executed
+    finally:
+        table.executed = None
+    counts = [(query.split("FROM", 1)[1].split()[0], rows) for query, rows in executed]
+    if counts != [("appointments", booked), ("slot_holds", 0)]:
+        raise RuntimeError(f"Fake table returned {counts} for {start_str}..{end_str}, "
+                           f"expected {booked} appointments and no holds")
+
+
+def measure(func: Callable[[], Any], min_time: float, repeats: int) -> Dict[str, Any]:
+    """Time ``func`` and return per-call statistics in microseconds."""
+    # Calibrate the inner loop so each repeat runs for at least ``min_time``
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "min_us": round(min(samples), 3),
+        "max_us": round(max(samples), 3),
+        "iterations": number * repeats,
+    }
+
+
+def import_time_ms(module: str) -> float:
+    """Cumulative import time of ``module`` in a fresh interpreter, from ``-X importtime``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVICE_DIR, capture_output=True, text=True, check=True
+    )
+    for line in reversed(proc.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2] == f" {module}":
+            return int(fields[1]) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def measure_imports(repeats: int) -> Dict[str, Any]:
+    """Best-of-``repeats`` cold import time per module, with its budget."""
+    results = {}
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        best = min(import_time_ms(module) for _ in range(repeats))
+        results[module] = {"import_ms": round(best, 2), "budget_ms": budget}
+        marker = "" if best <= budget else " ❌"
+        print(f"  import {module:<48} {best:>9.2f} ms  (budget {budget} ms){marker}")
+    return results
+
+
+def build_cases(sizes: List[int], windows: List[int]) -> Dict[str, Tuple[Callable[[], Any], Callable[[], None]]]:
+    """Return ``{name: (callable, setup)}`` for every benchmark case."""
+    start = datetime.now() + timedelta(days=1)
+    start_str = start.strftime('%Y-%m-%d')
+    cases: Dict[str, Tuple[Callable[[], Any], Callable[[], None]]] = {}
+
+    def use_table(table: FakeTable, end_str: str) -> Callable[[], None]:
+        def setup():
+            agent.get_db_connection = lambda **kwargs: FakeConnection(table)
+            check_row_counts(table, start_str, end_str)
+        return setup
+
+    for size in sizes:
+        table = FakeTable(size, start)
+        for window in windows:
+            end_str = (start + timedelta(days=window)).strftime('%Y-%m-%d')
+            cases[f"get_available_slots[rows={size},window={window}]"] = (
+                lambda s=start_str, e=end_str: agent.get_available_slots(s, e),
+                use_table(table, end_str),
+            )
+        cases[f"find_nearest_available_slot[rows={size}]"] = (
+            lambda s=start_str: agent.find_nearest_available_slot(s),
+            use_table(table, agent.default_end_date(start_str)),
+        )
+
+    noop = lambda: None  # noqa: E731
+    cases["parse_slot_id[current]"] = (lambda: scheduling.parse_slot_id("2025-06-18-10:30"), noop)
+    cases["parse_slot_id[legacy]"] = (lambda: scheduling.parse_slot_id("2025-06-18-10-30"), noop)
+    cases["parse_slot_id[invalid]"] = (lambda: scheduling.parse_slot_id("tomorrow morning"), noop)
+    cases["parse_natural_date_time[iso]"] = (
+        lambda: agent.parse_natural_date_time("2025-06-18", "10:30"), noop)
+    cases["parse_natural_date_time[long]"] = (
+        lambda: agent.parse_natural_date_time("June 18, 2025", "10:30 AM"), noop)
+    cases["parse_natural_date_time[slash]"] = (
+        lambda: agent.parse_natural_date_time("18/06/2025", "10 AM"), noop)
+    cases["parse_smart_date_time[long]"] = (
+        lambda: agent.parse_smart_date_time("June 18, 2025 at 10:30 AM"), noop)
+    cases["parse_smart_date_time[iso]"] = (
+        lambda: agent.parse_smart_date_time("2025-06-18 10:30"), noop)
+    cases["parse_smart_date_time[no_year]"] = (
+        lambda: agent.parse_smart_date_time("June 18 at 10:30 AM"), noop)
+    cases["parse_smart_date_time[unparseable]"] = (
+        lambda: agent.parse_smart_date_time("sometime next week"), noop)
+    cases["format_time_12h[valid]"] = (lambda: agent.format_time_12h("14:30"), noop)
+    cases["format_time_12h[invalid]"] = (lambda: agent.format_time_12h("2pm"), noop)
+
+    return cases
+
+
+def run(sizes: List[int], windows: List[int], min_time: float, repeats: int, pattern: str,
+        imports: bool = True) -> Dict[str, Any]:
+    results = {}
+    original_connection = agent.get_db_connection
+    try:
+        for name, (func, setup) in build_cases(sizes, windows).items():
+            if pattern and pattern not in name:
+                continue
+            setup()
+            results[name] = measure(func, min_time, repeats)
+            print(f"  {name:<55} {results[name]['median_us']:>12.2f} µs")
+    finally:
+        agent.get_db_connection = original_connection
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "min_time": min_time,
+            "repeats": repeats,
+        },
+        "results": results,
+        "imports": measure_imports(repeats) if imports else {},
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print a comparison table and return the names of regressed cases."""
+    regressions = []
+    base_results = baseline.get("results", {})
+    print(f"\n📊 Comparison against baseline from {baseline.get('meta', {}).get('created_at', 'unknown')}")
+    print(f"  {'case':<55} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, result in current["results"].items():
+        base = base_results.get(name)
+        if not base:
+            print(f"  {name:<55} {'-':>12} {result['median_us']:>12.2f} {'new':>8}")
+            continue
+        ratio = result["median_us"] / base["median_us"] if base["median_us"] else float("inf")
+        marker = ""
+        if ratio > threshold:
+            regressions.append(name)
+            marker = " ❌"
+        elif ratio < 1 / threshold:
+            marker = " ✅"
+        print(f"  {name:<55} {base['median_us']:>12.2f} {result['median_us']:>12.2f} {ratio:>7.2f}x{marker}")
+    return regressions
+
+
+def over_budget(current: Dict[str, Any]) -> List[str]:
+    """Modules whose cold import took longer than their budget."""
+    return [f"import {module}" for module, result in current.get("imports", {}).items()
+            if result["import_ms"] > result["budget_ms"]]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark scheduling agent hot paths")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit non-zero on regressions")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per repeat")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repeats per case")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DATASET_SIZES, help="Booked rows per dataset")
+    parser.add_argument("--windows", type=int, nargs="+", default=WINDOW_LENGTHS, help="Window lengths in days")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this string")
+    parser.add_argument("--with-logging", action="store_true", help="Keep agent log output enabled")
+    parser.add_argument("--skip-imports", action="store_true", help="Do not measure module import times")
+    args = parser.parse_args()
+
+    if not args.with_logging:
+        # Keep log records out of the timings
+        for name in ("agent", "scheduling"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    print("⏱️  Running scheduling agent micro-benchmarks...")
+    current = run(args.sizes, args.windows, args.min_time, args.repeats, args.filter, not args.skip_imports)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nℹ️  No baseline at {args.baseline}; run with --save-baseline to create one")
+        slow_imports = over_budget(current)
+        if slow_imports:
+            print(f"\n❌ Over import budget: {', '.join(slow_imports)}")
+            return 1 if args.fail_on_regression else 0
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold) + over_budget(current)
+    if regressions:
+        print(f"\n❌ {len(regressions)} case(s) slower than {args.threshold:.2f}x baseline or over import budget")
+        return 1 if args.fail_on_regression else 0
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
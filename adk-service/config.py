@@ -2,10 +2,10 @@
 
 import os
 import logging
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 class AgentModel(BaseModel):
@@ -13,6 +13,11 @@ class AgentModel(BaseModel):
     
     name: str = Field(default="sap_doc_scheduling_assistant")
     model: str = Field(default="gemini-2.5-flash")
+    # Model tiering: short single-intent turns go to fast_model, multi-step
+    # workflows (rescheduling, multi-slot booking) to strong_model
+    tiering: bool = Field(default=False)
+    fast_model: str = Field(default="gemini-2.5-flash-lite")
+    strong_model: str = Field(default="gemini-2.5-flash")
 
 class Config(BaseSettings):
     """Configuration settings for the SAP Doc scheduling assistant."""
@@ -32,3 +37,24 @@ class Config(BaseSettings):
     # Google ADK settings - using direct API key, not Vertex AI
     GOOGLE_API_KEY: str = Field(default="")
     GOOGLE_GENAI_USE_VERTEXAI: str = Field(default="0")  # Disable Vertex AI
+    
+    # Environment overrides for agent_settings
+    AGENT_MODEL: Optional[str] = Field(default=None)
+    AGENT_MODEL_TIERING: Optional[bool] = Field(default=None)
+    AGENT_FAST_MODEL: Optional[str] = Field(default=None)
+    AGENT_STRONG_MODEL: Optional[str] = Field(default=None)
+    
+    @model_validator(mode="after")
+    def apply_agent_overrides(self) -> "Config":
+        overrides = {
+            "model": self.AGENT_MODEL,
+            "tiering": self.AGENT_MODEL_TIERING,
+            "fast_model": self.AGENT_FAST_MODEL,
+            "strong_model": self.AGENT_STRONG_MODEL,
+        }
+        overrides = {k: v for k, v in overrides.items() if v is not None}
+        if overrides:
+            self.agent_settings = self.agent_settings.model_copy(update=overrides)
+        return self
+
+config = Config()
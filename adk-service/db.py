@@ -0,0 +1,261 @@
+"""Database access for the SAP Doc scheduling agent and proxy.
+
+Writes always go to the primary (``DB_HOST``). Read-only tools pass
+``readonly=True`` and are routed to one of the replicas in ``DB_REPLICA_DSNS``
+when one is healthy and no more than ``DB_REPLICA_MAX_LAG`` seconds behind.
+Otherwise they go to the primary. Replica health and lag are checked at most
+once every ``DB_REPLICA_CHECK_INTERVAL`` seconds per replica. Reads that
+must not lag, such as slot holds, pass ``primary=True`` as well.
+
+Read-your-writes: once a tool has written through the primary, reads made
+for the same ADK session stay on the primary for
+``DB_READ_YOUR_WRITES_SECONDS``, so a booking is never followed by stale
+availability. The ``route_db_reads`` and ``record_db_writes`` tool callbacks
+track this in session state.
+
+Every connection gets ``statement_timeout`` and ``lock_timeout`` (from
+``DB_STATEMENT_TIMEOUT_MS`` / ``DB_LOCK_TIMEOUT_MS``), lowered to the time
+left before the running tool's deadline when there is one (see deadlines.py).
+"""
+
+import contextvars
+import itertools
+import math
+import os
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.sql
+
+from deadlines import DeadlineExceeded, current_tool_deadline
+from tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated libpq connection strings or URLs for read replicas
+DB_REPLICA_DSNS = [dsn.strip() for dsn in os.getenv("DB_REPLICA_DSNS", "").split(",") if dsn.strip()]
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "10"))
+DB_REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+# Upper bounds for every statement and lock wait; 0 disables the default bound
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+DB_LOCK_TIMEOUT_MS = int(os.getenv("DB_LOCK_TIMEOUT_MS", "5000"))
+# libpq treats connect timeouts below 2 seconds as 2
+MIN_CONNECT_TIMEOUT = 2
+
+# Session state key holding the wall-clock time of the session's last write
+LAST_WRITE_STATE_KEY = "db:last_write_at"
+
+# Replay lag in seconds; zero when the replica has replayed everything it received
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class _TracedExecuteMixin:
+    """Record every executed statement as a child span of the running tool."""
+
+    def execute(self, query, vars=None):
+        if isinstance(query, psycopg2.sql.Composable):
+            query = query.as_string(self)
+        with start_span("db.query", **{"db.system": "postgresql", "db.statement": " ".join(query.split())}):
+            try:
+                return super().execute(query, vars)
+            except (psycopg2.errors.QueryCanceled, psycopg2.errors.LockNotAvailable):
+                tool_deadline = current_tool_deadline()
+                if tool_deadline is not None:
+                    tool_deadline.timed_out = True
+                raise
+
+
+class TracedCursor(_TracedExecuteMixin, psycopg2.extensions.cursor):
+    pass
+
+
+class TracedRealDictCursor(_TracedExecuteMixin, psycopg2.extras.RealDictCursor):
+    pass
+
+
+class _Routing:
+    """Per-tool-call routing state shared between the callbacks and get_db_connection."""
+
+    __slots__ = ("primary_until", "wrote")
+
+    def __init__(self, primary_until: float = 0.0):
+        self.primary_until = primary_until
+        self.wrote = False
+
+
+_routing: contextvars.ContextVar[Optional[_Routing]] = contextvars.ContextVar("db_routing", default=None)
+
+
+class Replica:
+    """A read replica with its cached health and lag."""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self.error: Optional[str] = None
+
+    def connect(self, options: Optional[str] = None):
+        """Connect, re-checking health and lag when the cached result is stale."""
+        if not self.healthy and time.monotonic() - self.checked_at < DB_REPLICA_CHECK_INTERVAL:
+            return None
+        try:
+            conn = psycopg2.connect(self.dsn, connect_timeout=DB_REPLICA_CONNECT_TIMEOUT,
+                                    options=options, cursor_factory=TracedCursor)
+        except psycopg2.Error as e:
+            self._mark(False, error=str(e).strip())
+            return None
+        if time.monotonic() - self.checked_at >= DB_REPLICA_CHECK_INTERVAL:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(REPLICA_LAG_QUERY)
+                    lag = float(cursor.fetchone()[0])
+                conn.rollback()
+            except psycopg2.Error as e:
+                conn.close()
+                self._mark(False, error=str(e).strip())
+                return None
+            self._mark(lag <= DB_REPLICA_MAX_LAG, lag=lag,
+                       error=None if lag <= DB_REPLICA_MAX_LAG else f"lag {lag:.1f}s")
+        if not self.healthy:
+            conn.close()
+            return None
+        conn.set_session(readonly=True)
+        return conn
+
+    def _mark(self, healthy: bool, lag: float = 0.0, error: Optional[str] = None) -> None:
+        if healthy != self.healthy:
+            logger.warning("Read replica %s is now %s%s", _redact(self.dsn),
+                           "healthy" if healthy else "unavailable", f" ({error})" if error else "")
+        self.healthy = healthy
+        self.lag = lag
+        self.error = error
+        self.checked_at = time.monotonic()
+
+
+def _redact(dsn: str) -> str:
+    """Hide passwords in DSNs before logging them."""
+    if "://" in dsn and "@" in dsn:
+        scheme, rest = dsn.split("://", 1)
+        return f"{scheme}://***@{rest.rsplit('@', 1)[1]}"
+    return " ".join("password=***" if part.startswith("password=") else part for part in dsn.split())
+
+
+REPLICAS: List[Replica] = [Replica(dsn) for dsn in DB_REPLICA_DSNS]
+_next_replica = itertools.count()
+ROUTING_STATS = {"primary_reads": 0, "replica_reads": 0, "read_your_writes": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(stat: str) -> None:
+    with _stats_lock:
+        ROUTING_STATS[stat] += 1
+
+
+def _connect_replica(options: Optional[str]):
+    """Connection to the next usable replica in round-robin order, or None."""
+    start = next(_next_replica)
+    for i in range(len(REPLICAS)):
+        conn = REPLICAS[(start + i) % len(REPLICAS)].connect(options)
+        if conn is not None:
+            return conn
+    return None
+
+
+def _timeouts(connect_timeout: Optional[int]) -> Tuple[Optional[int], Optional[str]]:
+    """Connect timeout and libpq ``options`` bounding statements by the tool deadline."""
+    statement_ms, lock_ms = DB_STATEMENT_TIMEOUT_MS, DB_LOCK_TIMEOUT_MS
+    tool_deadline = current_tool_deadline()
+    if tool_deadline is not None:
+        left = tool_deadline.remaining()
+        if left <= 0:
+            tool_deadline.timed_out = True
+            raise DeadlineExceeded("The turn deadline passed before the database call started")
+        left_ms = max(int(left * 1000), 1)
+        statement_ms = min(statement_ms, left_ms) if statement_ms else left_ms
+        lock_ms = min(lock_ms, left_ms) if lock_ms else left_ms
+        left_s = max(math.ceil(left), MIN_CONNECT_TIMEOUT)
+        connect_timeout = min(connect_timeout, left_s) if connect_timeout else left_s
+    settings = []
+    if statement_ms:
+        settings.append(f"-c statement_timeout={statement_ms}")
+    if lock_ms:
+        settings.append(f"-c lock_timeout={lock_ms}")
+    return connect_timeout, " ".join(settings) or None
+
+
+def get_db_connection(connect_timeout: Optional[int] = None, readonly: bool = False,
+                      primary: bool = False):
+    """Get database connection using environment variables.
+
+    ``readonly=True`` may return a replica connection; use it only for
+    queries that do not write. With ``primary=True`` as well, the read goes to
+    the primary without counting as a write for read-your-writes.
+    """
+    connect_timeout, options = _timeouts(connect_timeout)
+    routing = _routing.get()
+    if readonly and primary:
+        _count("primary_reads")
+    elif readonly and REPLICAS:
+        if routing is not None and time.time() < routing.primary_until:
+            _count("read_your_writes")
+        else:
+            conn = _connect_replica(options)
+            if conn is not None:
+                _count("replica_reads")
+                return conn
+        _count("primary_reads")
+    elif not readonly and routing is not None:
+        routing.wrote = True
+
+    try:
+        conn = psycopg2.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            database=os.getenv('DB_NAME', 'sap_doc_app'),
+            user=os.getenv('DB_USER', 'kade'),
+            password=os.getenv('DB_PASSWORD', 'password123'),
+            port=os.getenv('DB_PORT', '5432'),
+            connect_timeout=connect_timeout,
+            options=options,
+            cursor_factory=TracedCursor
+        )
+        return conn
+    except Exception as e:
+        tool_deadline = current_tool_deadline()
+        if tool_deadline is not None and tool_deadline.remaining() <= 0:
+            tool_deadline.timed_out = True
+        logger.error("Database connection failed: %s", e)
+        raise
+
+
+# ADK tool callbacks
+
+def route_db_reads(tool, args, tool_context) -> None:
+    """Before-tool callback: keep this session's reads on the primary right after its writes."""
+    last_write = tool_context.state.get(LAST_WRITE_STATE_KEY) or 0.0
+    _routing.set(_Routing(primary_until=last_write + DB_READ_YOUR_WRITES_SECONDS))
+    return None
+
+
+def record_db_writes(tool, args, tool_context, tool_response) -> None:
+    """After-tool callback: remember when the session last used a primary connection."""
+    routing = _routing.get()
+    if routing is not None and routing.wrote:
+        tool_context.state[LAST_WRITE_STATE_KEY] = time.time()
+    _routing.set(None)
+    return None
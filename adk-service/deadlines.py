@@ -0,0 +1,112 @@
+"""
+Per-turn deadlines, from the CORS proxy down to individual SQL statements.
+
+The proxy gives every agent turn an absolute deadline (``TURN_DEADLINE_SECONDS``
+after the request arrived) and sends it to ADK in the ``/run`` state delta. In
+the agent:
+
+- ``start_turn_deadline`` (before-agent) takes the deadline out of session
+  state for the current invocation, so a later turn that arrives without one
+  does not inherit a stale deadline;
+- ``check_tool_deadline`` (before-tool) refuses to start a tool once the turn
+  is within ``TOOL_DEADLINE_MARGIN_SECONDS`` of its deadline, and otherwise
+  makes the tool's deadline available to ``db.get_db_connection``. That margin
+  leaves the model time to answer;
+- the database layer turns the remaining time into ``statement_timeout`` and
+  ``lock_timeout`` for the tool's connection;
+- ``report_tool_timeouts`` (after-tool) replaces the result of a tool whose
+  query was cancelled with a structured ``{"status": "timeout"}`` result.
+"""
+
+import contextvars
+import os
+import time
+from typing import Any, Dict, Optional
+
+from turn_state import TurnState
+
+# Session state key carrying the turn's absolute deadline (Unix time)
+DEADLINE_STATE_KEY = "turn:deadline"
+
+TURN_DEADLINE_SECONDS = float(os.getenv("TURN_DEADLINE_SECONDS", "55"))
+TOOL_DEADLINE_MARGIN_SECONDS = float(os.getenv("TOOL_DEADLINE_MARGIN_SECONDS", "10"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when there is no time left to start a database operation."""
+
+
+class ToolDeadline:
+    """Deadline of the running tool call, and whether it was hit."""
+
+    __slots__ = ("at", "timed_out")
+
+    def __init__(self, at: float):
+        self.at = at
+        self.timed_out = False
+
+    def remaining(self) -> float:
+        return self.at - time.time()
+
+
+_tool_deadline: contextvars.ContextVar[Optional[ToolDeadline]] = contextvars.ContextVar(
+    "tool_deadline", default=None
+)
+# invocation_id -> absolute turn deadline
+_turn_deadlines: TurnState[float] = TurnState()
+
+
+def new_turn_deadline() -> float:
+    """Absolute deadline for a turn starting now."""
+    return time.time() + TURN_DEADLINE_SECONDS
+
+
+def remaining(deadline: float) -> float:
+    return max(deadline - time.time(), 0.0)
+
+
+def current_tool_deadline() -> Optional[ToolDeadline]:
+    return _tool_deadline.get()
+
+
+# ADK agent callbacks
+
+def start_turn_deadline(callback_context) -> None:
+    deadline = callback_context.state.get(DEADLINE_STATE_KEY)
+    if deadline:
+        _turn_deadlines[callback_context.invocation_id] = float(deadline)
+        callback_context.state[DEADLINE_STATE_KEY] = None
+    return None
+
+
+def end_turn_deadline(callback_context) -> None:
+    _turn_deadlines.pop(callback_context.invocation_id, None)
+    return None
+
+
+def _timeout_result(tool_name: str) -> Dict[str, Any]:
+    return {
+        "status": "timeout",
+        "message": f"{tool_name} did not finish in time and was stopped; nothing was changed. "
+                   "Tell the user and offer to try again.",
+    }
+
+
+def check_tool_deadline(tool, args, tool_context) -> Optional[Dict[str, Any]]:
+    deadline = _turn_deadlines.get(tool_context.invocation_id)
+    if deadline is None:
+        _tool_deadline.set(None)
+        return None
+    tool_deadline = ToolDeadline(deadline - TOOL_DEADLINE_MARGIN_SECONDS)
+    if tool_deadline.remaining() <= 0:
+        return _timeout_result(tool.name)
+    _tool_deadline.set(tool_deadline)
+    return None
+
+
+def report_tool_timeouts(tool, args, tool_context, tool_response) -> Optional[Dict[str, Any]]:
+    tool_deadline = _tool_deadline.get()
+    _tool_deadline.set(None)
+    if tool_deadline is not None and tool_deadline.timed_out:
+        return _timeout_result(tool.name)
+    return None
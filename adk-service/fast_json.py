@@ -0,0 +1,23 @@
+"""JSON encoding for the proxy hot path: orjson when installed, stdlib json otherwise."""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+
+def loads(data: Any) -> Any:
+    """Parse JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
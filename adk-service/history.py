@@ -0,0 +1,156 @@
+"""
+Conversation history management for the SAP Doc scheduling agent.
+
+ADK sends the whole session history to the model on every call, so long
+conversations get slower and more expensive turn after turn. The
+``bound_history`` before-model callback keeps the model context small:
+
+- only the last ``HISTORY_MAX_TURNS`` user turns are sent verbatim, and older
+  turns are also dropped while the request exceeds ``HISTORY_TOKEN_BUDGET``;
+- dropped turns are folded into a short extractive summary kept in session
+  state (``history:summary``), updated incrementally as turns age out, and
+  added to the system instruction;
+- large tool outputs from earlier turns are cut down to
+  ``HISTORY_TOOL_OUTPUT_MAX_CHARS``; the current turn is never modified.
+
+Summaries are built without a model call so trimming never adds latency.
+"""
+
+import json
+import os
+from typing import Any, List, Optional
+
+from google.genai import types
+
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+HISTORY_TOOL_OUTPUT_MAX_CHARS = int(os.getenv("HISTORY_TOOL_OUTPUT_MAX_CHARS", "600"))
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "2000"))
+
+SUMMARY_STATE_KEY = "history:summary"
+SUMMARIZED_TURNS_STATE_KEY = "history:summarized_turns"
+
+# Rough characters-per-token ratio used for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+# Tool arguments worth keeping in the summary of a dropped turn
+SUMMARY_ARG_KEYS = ("slot_id", "patient_name", "date", "start_date", "date_time_input")
+
+
+def _is_user_message(content: types.Content) -> bool:
+    """A new turn starts with a user content carrying text, not a tool result."""
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+def split_turns(contents: List[types.Content]) -> List[List[types.Content]]:
+    """Group contents into turns, each starting at a user message."""
+    turns: List[List[types.Content]] = []
+    for content in contents:
+        if not turns or _is_user_message(content):
+            turns.append([])
+        turns[-1].append(content)
+    return turns
+
+
+def _part_size(part: types.Part) -> int:
+    if part.text:
+        return len(part.text)
+    if part.function_call:
+        return len(json.dumps(part.function_call.args or {}, default=str))
+    if part.function_response:
+        return len(json.dumps(part.function_response.response or {}, default=str))
+    return 0
+
+
+def estimate_tokens(contents: List[types.Content]) -> int:
+    chars = sum(_part_size(part) for content in contents for part in content.parts or [])
+    return chars // CHARS_PER_TOKEN
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _trim_tool_outputs(content: types.Content) -> types.Content:
+    """Return a copy of ``content`` with oversized tool results cut down."""
+    parts = []
+    changed = False
+    for part in content.parts or []:
+        response = part.function_response
+        if response and _part_size(part) > HISTORY_TOOL_OUTPUT_MAX_CHARS:
+            payload = json.dumps(response.response or {}, default=str)
+            part = types.Part(function_response=types.FunctionResponse(
+                id=response.id,
+                name=response.name,
+                response={
+                    "truncated": True,
+                    "original_chars": len(payload),
+                    "preview": payload[:HISTORY_TOOL_OUTPUT_MAX_CHARS],
+                },
+            ))
+            changed = True
+        parts.append(part)
+    return content.model_copy(update={"parts": parts}) if changed else content
+
+
+def summarize_turn(turn: List[types.Content]) -> str:
+    """One-line digest of a turn: what the user asked, which tools ran, the answer."""
+    asked = ""
+    answer = ""
+    actions = []
+    for content in turn:
+        for part in content.parts or []:
+            if part.text and content.role == "user" and not asked:
+                asked = _shorten(part.text, 160)
+            elif part.text and content.role == "model":
+                answer = _shorten(part.text, 160)
+            elif part.function_call:
+                args = part.function_call.args or {}
+                kept = ", ".join(f"{k}={args[k]}" for k in SUMMARY_ARG_KEYS if k in args)
+                actions.append(f"{part.function_call.name}({kept})")
+    line = f"- User: {asked or '(no text)'}"
+    if actions:
+        line += f" | Tools: {'; '.join(actions)}"
+    if answer:
+        line += f" | Assistant: {answer}"
+    return line
+
+
+def _fold_summary(previous: str, new_lines: List[str]) -> str:
+    """Append new turn digests, dropping the oldest lines beyond the size cap."""
+    lines = [line for line in previous.splitlines() if line] + new_lines
+    while lines and len("\n".join(lines)) > HISTORY_SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def bound_history(callback_context, llm_request) -> Optional[Any]:
+    """Before-model callback that caps the history sent to the model."""
+    turns = split_turns(llm_request.contents or [])
+    if len(turns) <= 1:
+        return None
+
+    # Earlier turns lose their bulky tool outputs before the token budget is applied
+    trimmed = [[_trim_tool_outputs(c) for c in turn] for turn in turns[:-1]] + [turns[-1]]
+    keep = min(len(turns), max(HISTORY_MAX_TURNS, 1))
+    while keep > 1 and estimate_tokens([c for turn in trimmed[-keep:] for c in turn]) > HISTORY_TOKEN_BUDGET:
+        keep -= 1
+    dropped = turns[:-keep]
+
+    state = callback_context.state
+    summary = state.get(SUMMARY_STATE_KEY, "")
+    summarized = state.get(SUMMARIZED_TURNS_STATE_KEY, 0)
+    if len(dropped) > summarized:
+        summary = _fold_summary(summary, [summarize_turn(turn) for turn in dropped[summarized:]])
+        state[SUMMARY_STATE_KEY] = summary
+        state[SUMMARIZED_TURNS_STATE_KEY] = len(dropped)
+
+    llm_request.contents = [c for turn in trimmed[-keep:] for c in turn]
+
+    if dropped and summary:
+        llm_request.append_instructions([
+            "Summary of earlier turns in this conversation (oldest first). "
+            "Call the tools again if you need exact details:\n" + summary
+        ])
+    return None
+
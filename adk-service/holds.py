@@ -0,0 +1,91 @@
+"""
+Temporary slot holds while a patient confirms a booking.
+
+The agent confirms details with the patient before booking, so there are one
+or more turns between offering a slot and booking it. ``hold_appointment_slot``
+reserves the chosen slot for the current ADK session during that time:
+
+- a hold lasts ``SLOT_HOLD_SECONDS`` and simply expires when not booked; holding
+  the slot again from the same session extends it;
+- a session keeps at most ``SLOT_HOLD_MAX_PER_SESSION`` holds, and its oldest
+  hold is released when it places another;
+- availability lookups leave out slots held by other sessions, and booking a
+  slot held by another session is refused;
+- booking a slot turns this session's hold into the appointment.
+
+Holds are always read from the primary, since they last only minutes and a
+lagging replica could miss one placed moments ago. The backend availability
+and booking routes honour every active hold, as their callers have no session.
+
+Holds live in the ``slot_holds`` table (see backend/src/database/migrate.js),
+so they are shared by every agent process. The ``set_hold_owner`` tool
+callback makes the session id available to the tools as the hold owner.
+"""
+
+import contextvars
+import os
+from typing import Optional
+
+SLOT_HOLD_SECONDS = int(os.getenv("SLOT_HOLD_SECONDS", "300"))
+SLOT_HOLD_MAX_PER_SESSION = int(os.getenv("SLOT_HOLD_MAX_PER_SESSION", "3"))
+
+# Slot IDs held by other sessions in a date range
+HELD_BY_OTHERS_QUERY = """
+    SELECT slot_id FROM slot_holds
+    WHERE date BETWEEN %s AND %s AND expires_at > now() AND session_id IS DISTINCT FROM %s
+"""
+
+# Books a slot unless it is booked or another session holds it; returns no
+# row in either case. The hold check and the insert are one statement.
+BOOK_UNLESS_HELD_QUERY = """
+    INSERT INTO appointments (slot_id, time, date, patient_name, description)
+    SELECT %s, %s, %s, %s, %s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM slot_holds
+        WHERE slot_id = %s AND expires_at > now() AND session_id IS DISTINCT FROM %s
+    )
+    ON CONFLICT DO NOTHING
+    RETURNING id
+"""
+
+# Every active hold in a date range, for the shared availability snapshot
+ACTIVE_HOLDS_QUERY = """
+    SELECT slot_id, session_id FROM slot_holds
+    WHERE date BETWEEN %s AND %s AND expires_at > now()
+"""
+
+# Takes the slot unless another session holds it; returns no row in that case
+PLACE_HOLD_QUERY = """
+    INSERT INTO slot_holds (slot_id, date, session_id, expires_at)
+    VALUES (%s, %s, %s, now() + make_interval(secs => %s))
+    ON CONFLICT (slot_id) DO UPDATE
+        SET session_id = EXCLUDED.session_id, expires_at = EXCLUDED.expires_at
+        WHERE slot_holds.session_id = EXCLUDED.session_id OR slot_holds.expires_at <= now()
+    RETURNING expires_at
+"""
+
+# Releases a session's holds beyond its newest SLOT_HOLD_MAX_PER_SESSION
+TRIM_HOLDS_QUERY = """
+    DELETE FROM slot_holds
+    WHERE session_id = %s AND slot_id NOT IN (
+        SELECT slot_id FROM slot_holds WHERE session_id = %s
+        ORDER BY expires_at DESC LIMIT %s
+    )
+"""
+
+# Run in the booking transaction, so the hold becomes the appointment
+RELEASE_HOLD_QUERY = "DELETE FROM slot_holds WHERE slot_id = %s"
+
+_hold_owner: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("hold_owner", default=None)
+
+
+def current_hold_owner() -> Optional[str]:
+    """Session id the running tool places and honours holds for."""
+    return _hold_owner.get()
+
+
+# ADK tool callbacks
+
+def set_hold_owner(tool, args, tool_context) -> None:
+    _hold_owner.set(tool_context.session.id)
+    return None
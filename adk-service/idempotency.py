@@ -0,0 +1,119 @@
+"""
+Idempotent handling of agent turns in the CORS proxy.
+
+Clients send an ``Idempotency-Key`` header with ``/run`` and session event
+requests. The first request with a key is forwarded to ADK; concurrent
+duplicates wait on that same upstream call, and repeats within
+``IDEMPOTENCY_TTL`` seconds get the stored response replayed instead of
+running the turn (and possibly a booking) again. Server errors and 429
+rejections are not stored, so a retry after them is forwarded normally.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Response
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = "idempotent-replayed"
+
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", "300"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+
+class StoredResponse:
+    """Response bytes kept for replay."""
+
+    __slots__ = ("status_code", "headers", "content", "media_type", "fingerprint", "expires_at")
+
+    def __init__(self, response: Response, fingerprint: str, ttl: float):
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self.content = response.body
+        self.media_type = response.media_type
+        self.fingerprint = fingerprint
+        self.expires_at = time.monotonic() + ttl
+
+    def to_response(self, replayed: bool) -> Response:
+        headers = dict(self.headers)
+        headers.pop("content-length", None)
+        if replayed:
+            headers[REPLAYED_HEADER] = "true"
+        return Response(
+            content=self.content,
+            status_code=self.status_code,
+            headers=headers,
+            media_type=self.media_type
+        )
+
+
+class IdempotencyCache:
+    """In-flight coalescing plus a TTL-bounded store of completed responses."""
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._completed: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        # key -> (body fingerprint, future resolving to the stored response or None)
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self.stats = {"forwarded": 0, "replayed": 0, "coalesced": 0, "conflicts": 0}
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        while self._completed:
+            key, stored = next(iter(self._completed.items()))
+            if stored.expires_at > now and len(self._completed) <= self.max_entries:
+                break
+            self._completed.pop(key)
+
+    def _conflict(self) -> Response:
+        self.stats["conflicts"] += 1
+        return Response(
+            content=b'{"error": "Idempotency-Key was already used with a different request body"}',
+            status_code=422,
+            media_type="application/json"
+        )
+
+    async def run(self, key: str, body: bytes, forward: Callable[[], Awaitable[Response]]) -> Response:
+        """Forward a request at most once per key and body within the TTL."""
+        fingerprint = hashlib.sha256(body).hexdigest()
+        self._purge()
+
+        stored: Optional[StoredResponse] = self._completed.get(key)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                return self._conflict()
+            self.stats["replayed"] += 1
+            return stored.to_response(replayed=True)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            if inflight[0] != fingerprint:
+                return self._conflict()
+            self.stats["coalesced"] += 1
+            stored = await asyncio.shield(inflight[1])
+            if stored is None:
+                # The original request failed without a response; try again ourselves
+                return await self.run(key, body, forward)
+            return stored.to_response(replayed=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        self.stats["forwarded"] += 1
+        stored = None
+        try:
+            response = await forward()
+            stored = StoredResponse(response, fingerprint, self.ttl)
+            if response.status_code < 500 and response.status_code != 429:
+                self._completed[key] = stored
+            return response
+        finally:
+            self._inflight.pop(key, None)
+            future.set_result(stored)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"stored": len(self._completed), "inflight": len(self._inflight), **self.stats}
@@ -0,0 +1,158 @@
+"""
+Logging for the SAP Doc ADK service: non-blocking, structured and cheap on hot paths.
+
+``configure_logging()`` points the root logger at a ``QueueHandler``, so a
+logging call only puts the record on a bounded in-memory queue. A
+``QueueListener`` thread formats the records and writes them to stderr.
+Formatting is deferred as well: the message is not built from its ``%``
+arguments until the listener writes it, and not at all for records that are
+filtered out. When the queue is full, records are dropped and counted instead
+of blocking the caller.
+
+- ``LOG_LEVEL`` - root level (default INFO)
+- ``LOG_LEVELS`` - per-module overrides, e.g. ``proxy=DEBUG,httpx=WARNING``
+- ``LOG_FORMAT`` - ``json`` (default, one object per line) or ``text``
+- ``LOG_QUEUE_SIZE`` - records buffered before dropping (default 10000)
+
+Messages logged from hot paths can go through ``SampledLogger``, which passes
+on only one in ``LOG_SAMPLE_EVERY`` records per message template.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock handler formats every record in the logging thread before
+    enqueueing it. The queue here never leaves the process, so the record can
+    go as-is; only exception info is rendered, since the traceback keeps
+    whole frames alive.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Logger for hot paths that passes on one in ``every`` records per message template."""
+
+    def __init__(self, logger: logging.Logger, every: int = LOG_SAMPLE_EVERY):
+        super().__init__(logger, {})
+        self.every = max(every, 1)
+        self._counts: Dict[str, int] = {}
+
+    def log(self, level: int, msg: str, *args: Any, **kwargs: Any) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        count = self._counts.get(msg, 0)
+        self._counts[msg] = count + 1
+        if count % self.every:
+            return
+        kwargs["extra"] = {**(kwargs.get("extra") or {}), "sampled_every": self.every}
+        # Skip this method and the level method below, so records name the caller
+        kwargs.setdefault("stacklevel", 3)
+        self.logger.log(level, msg, *args, **kwargs)
+
+    # Defined here rather than inherited from LoggerAdapter: Python 3.11+ does
+    # not count frames inside the logging module, so stacklevel would differ
+    def debug(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg: str, *args: Any, **kwargs: Any) -> None:
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """Install the queue-based handler on the root logger; later calls are no-ops."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "text":
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(level)
+    for name, module_level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full."""
+    return sum(h.dropped for h in logging.getLogger().handlers if isinstance(h, LazyQueueHandler))
@@ -0,0 +1,170 @@
+"""
+Complexity-based model tiering for the SAP Doc scheduling agent.
+
+Most turns are short, single-intent requests ("what's free on Monday?") that
+do not need the agent's strongest model. When tiering is enabled in
+``config.agent_settings``, ``route_model`` picks a model per turn:
+
+- the fast tier for short single-intent messages;
+- the strong tier for multi-step workflows: rescheduling, several
+  appointments or dates in one request, long messages, or a turn that has
+  already made more than one round of tool calls.
+
+A turn never drops back to the fast tier once it has been escalated. Per-tier
+call counts, latency and token usage are kept in ``TIER_STATS`` and logged
+every ``MODEL_STATS_LOG_EVERY`` calls. The agent runs in the ADK API server
+process, so it also writes them to ``MODEL_STATS_PATH`` at most every
+``MODEL_STATS_WRITE_SECONDS``; the proxy's ``/metrics`` reads that file.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from config import config
+from turn_state import TurnState
+
+logger = logging.getLogger(__name__)
+
+MODEL_STATS_LOG_EVERY = int(os.getenv("MODEL_STATS_LOG_EVERY", "50"))
+MODEL_STATS_PATH = os.getenv("MODEL_STATS_PATH", "model_stats.json")  # empty disables
+MODEL_STATS_WRITE_SECONDS = float(os.getenv("MODEL_STATS_WRITE_SECONDS", "5"))
+# Messages longer than this are treated as multi-step requests
+FAST_TIER_MAX_CHARS = int(os.getenv("FAST_TIER_MAX_CHARS", "200"))
+# Model calls within one turn after which the strong tier takes over
+FAST_TIER_MAX_CALLS = int(os.getenv("FAST_TIER_MAX_CALLS", "2"))
+
+MULTI_STEP_PATTERN = re.compile(
+    r"\b(reschedul\w*|move|change|switch|swap|instead|both|several|multiple|"
+    r"all of|each|every|two|three|four|and then|as well as|also)\b",
+    re.IGNORECASE,
+)
+DATE_PATTERN = re.compile(
+    r"\b(\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}(?:/\d{2,4})?|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|tomorrow|today|"
+    r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? \d{1,2})\b",
+    re.IGNORECASE,
+)
+TIME_PATTERN = re.compile(r"\b\d{1,2}(?::\d{2})?\s*(?:am|pm)\b|\b\d{1,2}:\d{2}\b", re.IGNORECASE)
+
+FAST, STRONG, DEFAULT = "fast", "strong", "default"
+
+# Per-turn state: invocation_id -> (tier, model calls so far, current call start)
+_turns: TurnState[Tuple[str, int, float]] = TurnState()
+_lock = threading.Lock()
+TIER_STATS: Dict[str, Dict[str, float]] = {}
+_calls_since_log = 0
+_written_at = 0.0
+
+
+def _latest_user_text(llm_request) -> str:
+    for content in reversed(llm_request.contents or []):
+        if content.role == "user":
+            text = " ".join(part.text for part in content.parts or [] if part.text)
+            if text:
+                return text
+    return ""
+
+
+def classify(text: str) -> str:
+    """Return the tier a user message needs."""
+    if len(text) > FAST_TIER_MAX_CHARS:
+        return STRONG
+    if MULTI_STEP_PATTERN.search(text):
+        return STRONG
+    if len(DATE_PATTERN.findall(text)) > 1 or len(TIME_PATTERN.findall(text)) > 1:
+        return STRONG
+    return FAST
+
+
+def route_model(callback_context, llm_request) -> Optional[Any]:
+    """Before-model callback that selects the model tier for this call."""
+    settings = config.agent_settings
+    invocation_id = callback_context.invocation_id
+    tier, calls, _ = _turns.get(invocation_id, (None, 0, 0.0))
+
+    if not settings.tiering:
+        tier = DEFAULT
+    elif tier != STRONG:
+        tier = classify(_latest_user_text(llm_request))
+        if calls >= FAST_TIER_MAX_CALLS:
+            tier = STRONG
+        llm_request.model = settings.fast_model if tier == FAST else settings.strong_model
+    else:
+        llm_request.model = settings.strong_model
+
+    _turns[invocation_id] = (tier, calls + 1, time.perf_counter())
+    return None
+
+
+def record_model_usage(callback_context, llm_response) -> Optional[Any]:
+    """After-model callback that updates per-tier latency and token counters."""
+    global _calls_since_log, _written_at
+    if getattr(llm_response, "partial", False):
+        return None
+    turn = _turns.get(callback_context.invocation_id)
+    if turn is None:
+        return None
+    tier, _, started = turn
+    usage = llm_response.usage_metadata
+
+    with _lock:
+        stats = TIER_STATS.setdefault(tier, {
+            "calls": 0, "latency_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+        })
+        stats["calls"] += 1
+        stats["latency_ms"] += (time.perf_counter() - started) * 1000
+        if usage is not None:
+            stats["prompt_tokens"] += usage.prompt_token_count or 0
+            stats["completion_tokens"] += usage.candidates_token_count or 0
+        _calls_since_log += 1
+        if MODEL_STATS_LOG_EVERY and _calls_since_log >= MODEL_STATS_LOG_EVERY:
+            _calls_since_log = 0
+            logger.info("Model tier stats: %s", tier_stats())
+        now = time.monotonic()
+        if MODEL_STATS_PATH and now - _written_at >= MODEL_STATS_WRITE_SECONDS:
+            _written_at = now
+            write_tier_stats()
+    return None
+
+
+def end_turn(callback_context) -> Optional[Any]:
+    """After-agent callback that drops the finished turn's routing state."""
+    _turns.pop(callback_context.invocation_id, None)
+    return None
+
+
+def tier_stats() -> Dict[str, Dict[str, float]]:
+    """Snapshot of the per-tier counters with average latency."""
+    snapshot = {}
+    for tier, stats in TIER_STATS.items():
+        calls = stats["calls"] or 1
+        snapshot[tier] = {**stats, "avg_latency_ms": round(stats["latency_ms"] / calls, 1)}
+    return snapshot
+
+
+def write_tier_stats(path: str = MODEL_STATS_PATH) -> None:
+    """Replace ``path`` with the current per-tier counters."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": time.time(), "pid": os.getpid(),
+                       "tiers": tier_stats()}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Failed to write model tier stats to %s: %s", path, e)
+
+
+def load_tier_stats(path: str = MODEL_STATS_PATH) -> Optional[Dict[str, Any]]:
+    """Counters last written by the agent process, or None if there are none yet."""
+    if not path:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,262 @@
+"""
+Monthly partitioning and archival of the appointments table.
+
+The agent only reads the coming weeks, but a single ``appointments`` table
+keeps every past visit, so its indexes keep growing. This tool turns it into
+a table range-partitioned by ``date``, with one partition per month
+(``appointments_2025_07``) and a default partition for dates that no monthly
+partition covers yet. Queries that filter on ``date`` only touch the matching
+partitions. Slot lookups therefore pass the slot's date along with its ID.
+
+Partitioned tables need the partition key in every unique constraint, so the
+primary key becomes ``(id, date)`` and slot uniqueness becomes
+``UNIQUE (slot_id, date)``. A slot ID encodes its date, so this is the same
+guarantee as before.
+
+Subcommands:
+
+- ``migrate`` converts an unpartitioned table in one transaction. It creates
+  partitions from the oldest appointment through ``PARTITION_FUTURE_MONTHS``
+  ahead, copies the rows, and recreates the keys and indexes.
+- ``ensure-future-partitions`` creates the partitions for the current month
+  and the next ``--months`` months. Rows already in the default partition for
+  those months are moved into them. Run it from cron, e.g. daily.
+- ``archive`` detaches the partitions of months that ended more than
+  ``--months`` months ago (``ARCHIVE_AFTER_MONTHS``). It moves them into the
+  ``ARCHIVE_SCHEMA`` schema, where they stay queryable but out of the hot path.
+
+Usage:
+    python partitions.py migrate
+    python partitions.py ensure-future-partitions --months 3
+    python partitions.py archive --months 12 --dry-run
+"""
+
+import argparse
+import os
+import re
+import sys
+from datetime import date
+from typing import List, Optional, Tuple
+
+from psycopg2 import sql
+
+from db import get_db_connection
+
+PARTITION_FUTURE_MONTHS = int(os.getenv("PARTITION_FUTURE_MONTHS", "3"))
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "12"))
+ARCHIVE_SCHEMA = os.getenv("ARCHIVE_SCHEMA", "archive")
+
+TABLE = "appointments"
+DEFAULT_PARTITION = f"{TABLE}_default"
+COLUMNS = "id, slot_id, time, date, patient_name, description, created_at, updated_at"
+
+# Bounds of each monthly partition as written by pg_get_expr(relpartbound)
+BOUND_PATTERN = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+def month_start(day: date, months: int = 0) -> date:
+    """First day of the month ``months`` months after the month of ``day``."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_{month.year}_{month.month:02d}"
+
+
+def _begin_maintenance(cursor) -> None:
+    # Copying and re-indexing can take longer than the agent's statement timeout
+    cursor.execute("SET LOCAL statement_timeout = 0")
+    cursor.execute("SET LOCAL lock_timeout = '10s'")
+
+
+def is_partitioned(cursor) -> bool:
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (TABLE,))
+    row = cursor.fetchone()
+    if row is None:
+        raise RuntimeError(f"Table {TABLE} does not exist; run the backend migration first")
+    return row[0] == "p"
+
+
+def monthly_partitions(cursor) -> List[Tuple[str, str, date, date]]:
+    """(schema, name, from, to) of every monthly partition, oldest first."""
+    cursor.execute("""
+        SELECT n.nspname, c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE i.inhparent = to_regclass(%s)
+    """, (TABLE,))
+    partitions = []
+    for schema, name, bound in cursor.fetchall():
+        match = BOUND_PATTERN.search(bound)
+        if match:
+            partitions.append((schema, name, date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda p: p[2])
+
+
+def create_partition(cursor, month: date) -> bool:
+    """Create the partition for ``month`` unless it exists; return whether it was created.
+
+    Rows for that month already in the default partition are moved into the
+    new table before it is attached, since attaching would fail otherwise.
+    """
+    name = partition_name(month)
+    cursor.execute("SELECT to_regclass(%s)", (name,))
+    if cursor.fetchone()[0] is not None:
+        return False
+    lo, hi = month, month_start(month, 1)
+    cursor.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)").format(
+        sql.Identifier(name), sql.Identifier(TABLE)))
+    cursor.execute("SELECT to_regclass(%s)", (DEFAULT_PARTITION,))
+    if cursor.fetchone()[0] is not None:
+        cursor.execute(sql.SQL("""
+            WITH moved AS (DELETE FROM {} WHERE date >= %s AND date < %s RETURNING {})
+            INSERT INTO {} ({}) SELECT {} FROM moved
+        """).format(
+            sql.Identifier(DEFAULT_PARTITION), sql.SQL(COLUMNS),
+            sql.Identifier(name), sql.SQL(COLUMNS), sql.SQL(COLUMNS)
+        ), (lo, hi))
+    cursor.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(
+        sql.Identifier(TABLE), sql.Identifier(name)), (lo, hi))
+    return True
+
+
+# Subcommands
+
+def migrate(cursor, future_months: int = PARTITION_FUTURE_MONTHS) -> str:
+    if is_partitioned(cursor):
+        return f"{TABLE} is already partitioned"
+    cursor.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(sql.Identifier(TABLE)))
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (TABLE,))
+    sequence = cursor.fetchone()[0]
+    if sequence is None:
+        raise RuntimeError(f"{TABLE}.id is not backed by a sequence")
+    cursor.execute(sql.SQL("SELECT min(date), count(*) FROM {}").format(sql.Identifier(TABLE)))
+    oldest, row_count = cursor.fetchone()
+
+    # The old table's sequence must outlive it; its keys and indexes are
+    # dropped with it and recreated on the partitioned table
+    old = f"{TABLE}_unpartitioned"
+    cursor.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY NONE").format(sql.SQL(sequence)))
+    cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(sql.Identifier(TABLE), sql.Identifier(old)))
+    cursor.execute(sql.SQL("""
+        CREATE TABLE {} (
+            id INTEGER NOT NULL DEFAULT nextval({}::regclass),
+            slot_id VARCHAR(255) NOT NULL,
+            time VARCHAR(10) NOT NULL,
+            date DATE NOT NULL,
+            patient_name VARCHAR(255) NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) PARTITION BY RANGE (date)
+    """).format(sql.Identifier(TABLE), sql.Literal(sequence)))
+    cursor.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} DEFAULT").format(
+        sql.Identifier(DEFAULT_PARTITION), sql.Identifier(TABLE)))
+
+    this_month = month_start(date.today())
+    month = month_start(min(oldest, this_month)) if oldest else this_month
+    created = 0
+    while month <= month_start(this_month, future_months):
+        created += create_partition(cursor, month)
+        month = month_start(month, 1)
+
+    cursor.execute(sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {}").format(
+        sql.Identifier(TABLE), sql.SQL(COLUMNS), sql.SQL(COLUMNS), sql.Identifier(old)))
+    if cursor.rowcount != row_count:
+        raise RuntimeError(f"Copied {cursor.rowcount} of {row_count} appointments; rolling back")
+    cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(old)))
+    cursor.execute(sql.SQL("ALTER SEQUENCE {} OWNED BY {}.id").format(sql.SQL(sequence), sql.Identifier(TABLE)))
+
+    cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, date)")
+    cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_slot_id_date_key UNIQUE (slot_id, date)")
+    cursor.execute(f"CREATE INDEX idx_appointments_date ON {TABLE} (date)")
+    cursor.execute(
+        f"CREATE INDEX idx_appointments_patient_name ON {TABLE} (lower(patient_name) text_pattern_ops, date)"
+    )
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    if cursor.fetchone():
+        cursor.execute(
+            f"CREATE INDEX idx_appointments_patient_name_trgm ON {TABLE} USING gin (lower(patient_name) gin_trgm_ops)"
+        )
+    return f"Partitioned {TABLE}: {row_count} appointments in {created} monthly partitions plus {DEFAULT_PARTITION}"
+
+
+def ensure_future_partitions(cursor, months: int = PARTITION_FUTURE_MONTHS) -> str:
+    if not is_partitioned(cursor):
+        raise RuntimeError(f"{TABLE} is not partitioned yet; run `partitions.py migrate` first")
+    this_month = month_start(date.today())
+    created = [partition_name(month_start(this_month, i)) for i in range(months + 1)
+               if create_partition(cursor, month_start(this_month, i))]
+    return f"Created {', '.join(created)}" if created else "All partitions already exist"
+
+
+def archive(cursor, months: int = ARCHIVE_AFTER_MONTHS, schema: str = ARCHIVE_SCHEMA) -> str:
+    if not is_partitioned(cursor):
+        raise RuntimeError(f"{TABLE} is not partitioned yet; run `partitions.py migrate` first")
+    cutoff = month_start(date.today(), -months)
+    cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(schema)))
+    archived = []
+    for partition_schema, name, _, upper in monthly_partitions(cursor):
+        if upper > cutoff:
+            break
+        cursor.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+            sql.Identifier(TABLE), sql.Identifier(partition_schema, name)))
+        cursor.execute(sql.SQL("ALTER TABLE {} SET SCHEMA {}").format(
+            sql.Identifier(partition_schema, name), sql.Identifier(schema)))
+        archived.append(name)
+    if not archived:
+        return f"No partitions end before {cutoff}"
+    return f"Archived {len(archived)} partitions before {cutoff} to schema {schema}: {', '.join(archived)}"
+
+
+def run(command: str, dry_run: bool = False, months: Optional[int] = None) -> str:
+    """Run one subcommand in a single transaction, rolled back for a dry run."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        _begin_maintenance(cursor)
+        if command == "migrate":
+            message = migrate(cursor)
+        elif command == "ensure-future-partitions":
+            message = ensure_future_partitions(cursor, PARTITION_FUTURE_MONTHS if months is None else months)
+        else:
+            message = archive(cursor, ARCHIVE_AFTER_MONTHS if months is None else months)
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+        cursor.close()
+        return message
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the appointments table")
+    parser.add_argument("--dry-run", action="store_true", help="Roll back instead of committing")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Convert appointments into a partitioned table")
+    future = commands.add_parser("ensure-future-partitions", help="Create upcoming monthly partitions")
+    future.add_argument("--months", type=int, default=PARTITION_FUTURE_MONTHS, help="Months ahead to cover")
+    old = commands.add_parser("archive", help="Detach old partitions into the archive schema")
+    old.add_argument("--months", type=int, default=ARCHIVE_AFTER_MONTHS,
+                     help="Keep partitions of this many past months")
+    args = parser.parse_args()
+
+    print(f"🗄️  {args.command}{' (dry run)' if args.dry_run else ''}")
+    try:
+        message = run(args.command, args.dry_run, getattr(args, "months", None))
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {message}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Speculative availability prefetch for new chat sessions.
+
+Almost every conversation starts with an availability lookup, which costs a
+model -> tool -> model round trip. When the proxy hands out a session it
+fetches the booked slots for the next ``PREFETCH_DAYS`` days in the
+background. It attaches that snapshot to the session's first turn through
+the ``/run`` state delta, under ``PREFETCH_STATE_KEY``. The agent's
+``answer_from_prefetch`` tool callback then answers ``get_available_slots``
+and ``find_nearest_available_slot`` from the snapshot while it is fresh:
+
+- no older than ``PREFETCH_MAX_AGE_SECONDS``;
+- taken after the session's last booking or cancellation (see
+  ``db.LAST_WRITE_STATE_KEY``), so the session always sees its own changes.
+
+One snapshot is shared by all sessions and refreshed at most every
+``PREFETCH_REFRESH_SECONDS``.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+from db import LAST_WRITE_STATE_KEY, get_db_connection
+from holds import ACTIVE_HOLDS_QUERY
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_STATE_KEY = "prefetch:availability"
+
+PREFETCH_DAYS = int(os.getenv("PREFETCH_DAYS", "28"))
+PREFETCH_MAX_AGE_SECONDS = float(os.getenv("PREFETCH_MAX_AGE_SECONDS", "60"))
+PREFETCH_REFRESH_SECONDS = float(os.getenv("PREFETCH_REFRESH_SECONDS", "15"))
+# Sessions waiting for their first turn that are remembered at once
+PREFETCH_MAX_PENDING = 10000
+
+
+def fetch_availability(days: int = PREFETCH_DAYS) -> Dict[str, Any]:
+    """Snapshot of the booked and held slots from today through ``days`` days ahead."""
+    start = date.today()
+    end = start + timedelta(days=days)
+    conn = get_db_connection(readonly=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT date, time FROM appointments WHERE date BETWEEN %s AND %s",
+            (start, end)
+        )
+        booked = [f"{day.strftime('%Y-%m-%d')}-{slot_time}" for day, slot_time in cursor.fetchall()]
+        cursor.close()
+    finally:
+        conn.close()
+    # Holds come from the primary, since they are too short-lived for a lagging replica
+    conn = get_db_connection(readonly=True, primary=True)
+    try:
+        cursor = conn.cursor()
+        # [slot_id, session_id] pairs; a session may still be offered its own holds
+        cursor.execute(ACTIVE_HOLDS_QUERY, (start, end))
+        holds = [list(row) for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        conn.close()
+    return {
+        "fetched_at": time.time(),
+        "start": start.strftime("%Y-%m-%d"),
+        "end": end.strftime("%Y-%m-%d"),
+        "booked": booked,
+        "holds": holds,
+    }
+
+
+def fresh_availability(state) -> Optional[Dict[str, Any]]:
+    """The session's prefetched snapshot if tools may still answer from it."""
+    snapshot = state.get(PREFETCH_STATE_KEY)
+    if not snapshot:
+        return None
+    fetched_at = snapshot.get("fetched_at", 0)
+    if time.time() - fetched_at > PREFETCH_MAX_AGE_SECONDS:
+        return None
+    if (state.get(LAST_WRITE_STATE_KEY) or 0) >= fetched_at:
+        return None
+    return snapshot
+
+
+class AvailabilityPrefetcher:
+    """Keeps a shared availability snapshot for sessions that have not had a turn yet."""
+
+    def __init__(self, refresh_seconds: float = PREFETCH_REFRESH_SECONDS,
+                 max_age: float = PREFETCH_MAX_AGE_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.max_age = max_age
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._refresh: Optional[asyncio.Task] = None
+        self._pending: "OrderedDict[str, None]" = OrderedDict()
+        self.stats = {"attached": 0, "stale": 0, "refreshes": 0, "errors": 0}
+
+    def _age(self) -> float:
+        return time.time() - self._snapshot["fetched_at"] if self._snapshot else float("inf")
+
+    def _refresh_soon(self) -> None:
+        if self._age() < self.refresh_seconds or (self._refresh and not self._refresh.done()):
+            return
+        self._refresh = asyncio.create_task(self._fetch())
+
+    async def _fetch(self) -> None:
+        try:
+            self._snapshot = await asyncio.to_thread(fetch_availability)
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning("Availability prefetch failed: %s", e)
+
+    def expect(self, session_id: str) -> None:
+        """Note a session handed out to a client and start fetching in the background."""
+        self._pending[session_id] = None
+        while len(self._pending) > PREFETCH_MAX_PENDING:
+            self._pending.popitem(last=False)
+        self._refresh_soon()
+
+    def take(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Snapshot to attach to this session's first turn, if one is ready and fresh."""
+        if session_id not in self._pending:
+            return None
+        del self._pending[session_id]
+        self._refresh_soon()
+        if self._age() > self.max_age:
+            self.stats["stale"] += 1
+            return None
+        self.stats["attached"] += 1
+        return self._snapshot
+
+    def to_dict(self) -> Dict[str, Any]:
+        age = self._age()
+        return {
+            "pending_sessions": len(self._pending),
+            "snapshot_age": round(age, 1) if age != float("inf") else None,
+            **self.stats,
+        }
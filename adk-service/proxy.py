@@ -1,17 +1,63 @@
-from fastapi import FastAPI, Request, Response
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import FastAPI, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask, BackgroundTasks
+import asyncio
 import httpx
 import os
 import json
 import uvicorn
-import uuid
 
-app = FastAPI(title="ADK Service CORS Proxy")
+import fast_json
+from admission import AdmissionController, Rejected
+from deadlines import DEADLINE_STATE_KEY, new_turn_deadline, remaining
+from idempotency import IDEMPOTENCY_HEADER, IdempotencyCache
+from logging_setup import configure_logging, dropped_records
+from model_tiering import load_tier_stats
+from prefetch import PREFETCH_STATE_KEY, AvailabilityPrefetcher
+from response_cache import GetCache
+from session_pool import SessionPool, create_adk_session
+from startup import Readiness, run_startup
+from tracing import TRACE_STATE_KEY, TRACEPARENT_HEADER, new_span, start_span
+from ws_chat import CLOSE_POLICY_VIOLATION, ChatConnection
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run startup orchestration in the background so liveness is served immediately."""
+    async def start():
+        await run_startup(client, readiness, ADK_APP_NAME)
+        await session_pool.run()
+
+    startup_task = asyncio.create_task(start())
+    yield
+    startup_task.cancel()
+    await client.aclose()
+
+app = FastAPI(title="ADK Service CORS Proxy", lifespan=lifespan)
+
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", "1024"))
+
+class CompressionMiddleware(GZipMiddleware):
+    """Gzip responses for clients that accept it, except event streams that must flush per event."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/run_sse"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+app.add_middleware(CompressionMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+# Your frontend URLs
+ALLOWED_ORIGINS = ["http://localhost:5173", "http://127.0.0.1:5173"]
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],  # Your frontend URLs
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -21,103 +67,231 @@ app.add_middleware(
 ADK_HOST = os.environ.get("ADK_HOST", "localhost")
 ADK_PORT = os.environ.get("ADK_PORT", "8000")
 ADK_URL = f"http://{ADK_HOST}:{ADK_PORT}"
+ADK_APP_NAME = os.environ.get("ADK_APP_NAME", "sap-doc-app")
 
 # Session cache
 user_sessions = {}
 
-# Async HTTP client
-client = httpx.AsyncClient(base_url=ADK_URL, timeout=60.0)
+# Startup and readiness state
+readiness = Readiness()
+
+# Async HTTP client. ADK is on the local network, so upstream bodies stay
+# uncompressed and compression is negotiated with the browser instead.
+client = httpx.AsyncClient(base_url=ADK_URL, timeout=60.0, headers={"accept-encoding": "identity"})
+
+# Pre-created sessions handed out by /create-session
+session_pool = SessionPool(client, ADK_APP_NAME)
+
+# Availability snapshot attached to each new session's first turn
+prefetcher = AvailabilityPrefetcher()
+
+# Replay cache for retried agent turns
+idempotency_cache = IdempotencyCache()
+
+# Concurrency limits and rate limiting for agent turns
+admission = AdmissionController()
+
+# Coalescing of identical GETs and the opt-in micro-cache
+get_cache = GetCache()
+
+# ADK endpoints that execute an agent turn
+RUN_PATHS = {"run", "run_sse"}
+# Agent turn endpoints whose buffered responses can be replayed
+IDEMPOTENT_PATHS = {"run"}
+
+# Hop-by-hop headers (RFC 9110 section 7.6.1) apply to a single connection and are never forwarded
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "proxy-connection", "te", "trailer", "transfer-encoding", "upgrade",
+})
+# Request headers the proxy sets itself for the upstream hop
+UPSTREAM_SKIP_HEADERS = HOP_BY_HOP_HEADERS | {"host", "accept-encoding"}
+# Conditional headers answered by the proxy's GET cache rather than by ADK
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+
+def upstream_headers(request: Request) -> dict:
+    """Client headers that are safe to forward to ADK."""
+    return {k: v for k, v in request.headers.items() if k not in UPSTREAM_SKIP_HEADERS}
+
+def downstream_headers(response: httpx.Response, decoded: bool = True) -> dict:
+    """ADK response headers to send to the client.
+
+    Framing headers are recomputed by the server; when the body was decoded by
+    httpx the original content-encoding no longer applies either.
+    """
+    skip = HOP_BY_HOP_HEADERS | {"content-length", "content-encoding"} if decoded else HOP_BY_HOP_HEADERS
+    return {k: v for k, v in response.headers.items() if k not in skip}
+
+def error_response(message: str, status_code: int = 500) -> Response:
+    return Response(
+        content=fast_json.dumps({"error": message}),
+        status_code=status_code,
+        media_type="application/json"
+    )
+
+class TraceMiddleware:
+    """Open a root span per proxied request, continuing the caller's trace if any.
+
+    Plain ASGI rather than ``@app.middleware("http")`` so response bodies pass
+    through untouched instead of being re-wrapped per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        with start_span(
+            f"proxy {scope['method']} {scope['path']}",
+            traceparent,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as span:
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (TRACEPARENT_HEADER.encode(), span.traceparent.encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+app.add_middleware(TraceMiddleware)
+
+def with_turn_state(run_request: dict, traceparent: str, deadline: float) -> dict:
+    """Attach the trace context, turn deadline and any prefetched availability to a /run request."""
+    key = "state_delta" if "state_delta" in run_request else "stateDelta"
+    state_delta = dict(run_request.get(key) or {})
+    state_delta[TRACE_STATE_KEY] = traceparent
+    state_delta[DEADLINE_STATE_KEY] = deadline
+    availability = prefetcher.take(run_request.get("sessionId") or run_request.get("session_id"))
+    if availability is not None:
+        state_delta[PREFETCH_STATE_KEY] = availability
+    run_request[key] = state_delta
+    return run_request
+
+def session_path(run_request) -> str:
+    """ADK path of the session a turn runs in, or "" when the request does not name one."""
+    if not isinstance(run_request, dict):
+        return ""
+    app_name = run_request.get("appName") or run_request.get("app_name")
+    user_id = run_request.get("userId") or run_request.get("user_id")
+    session_id = run_request.get("sessionId") or run_request.get("session_id")
+    if not (app_name and user_id and session_id):
+        return ""
+    return f"/apps/{app_name}/users/{user_id}/sessions/{session_id}"
+
+def deadline_exceeded() -> Response:
+    return error_response("The request took too long to complete. Please try again.", 504)
+
+async def with_idempotency(request: Request, body: bytes, forward):
+    """Run forward() through the idempotency cache when the client sent a key."""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return await forward()
+    return await idempotency_cache.run(f"{request.url.path}:{key}", body, forward)
+
+async def admitted(user_id: str, forward):
+    """Run forward() under admission control, shedding load with 429/503 and Retry-After."""
+    async with AsyncExitStack() as stack:
+        try:
+            await stack.enter_async_context(admission.admit(user_id))
+        except Rejected as e:
+            return Response(
+                content=fast_json.dumps({"error": e.reason}),
+                status_code=e.status_code,
+                headers={"Retry-After": str(e.retry_after)},
+                media_type="application/json"
+            )
+        response = await forward()
+        if isinstance(response, StreamingResponse):
+            # A streamed turn keeps its slot until the last byte has been relayed
+            release = stack.pop_all()
+            tasks = [response.background] if response.background else []
+            response.background = BackgroundTasks([*tasks, BackgroundTask(release.aclose)])
+        return response
+
+def turn_user_id(request: Request, run_request) -> str:
+    """User a /run request is made for, falling back to the client address."""
+    if isinstance(run_request, dict):
+        user_id = run_request.get("userId") or run_request.get("user_id")
+        if user_id:
+            return str(user_id)
+    return request.client.host if request.client else "anonymous"
 
 @app.get("/")
 async def health_check():
     """Health check endpoint"""
     return {"status": "ok", "service": "ADK Service CORS Proxy"}
 
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the proxy process is up and serving"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness_check():
+    """Readiness probe: startup finished and both ADK and the database respond"""
+    if readiness.startup_complete:
+        await readiness.refresh(client)
+    return Response(
+        content=json.dumps(readiness.to_dict()),
+        status_code=200 if readiness.ready else 503,
+        media_type="application/json"
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Proxy counters: admission control, GET and idempotency caches, prefetch and session pool,
+    plus the agent's per-tier model stats"""
+    return {
+        "admission": admission.to_dict(),
+        "get_cache": get_cache.to_dict(),
+        "idempotency": idempotency_cache.to_dict(),
+        "log_records_dropped": dropped_records(),
+        "model_tiers": load_tier_stats(),
+        "prefetch": prefetcher.to_dict(),
+        "session_pool": session_pool.to_dict(),
+    }
+
 @app.post("/create-session")
 async def create_session():
     """Create a new session with ADK API server"""
     try:
-        # Generate stable IDs for the user and session
-        user_id = f"user-{uuid.uuid4()}"
-        session_id = f"session-{uuid.uuid4()}"
-        app_name = "sap-doc-app"
+        # Hand out a pre-created session, falling back to creating one now
+        session = session_pool.acquire()
+        if session is None:
+            session = await create_adk_session(client, ADK_APP_NAME)
         
-        # Create a session with the ADK API server using the specific session ID
-        response = await client.post(
-            f"/apps/{app_name}/users/{user_id}/sessions/{session_id}",
-            json={"state": {}}
-        )
+        # Start fetching availability for the first turn while the user types
+        prefetcher.expect(session["session_id"])
         
-        if response.status_code == 200:
-            # Store the session in our cache
-            user_sessions[session_id] = {
-                "user_id": user_id,
-                "app_name": app_name
-            }
-            
-            return {
-                "success": True,
-                "userId": user_id,
-                "sessionId": session_id,
-                "appName": app_name
-            }
-        else:
-            return {
-                "success": False,
-                "error": f"Failed to create session: {response.status_code} {response.text}"
-            }
+        # Store the session in our cache
+        user_sessions[session["session_id"]] = {
+            "user_id": session["user_id"],
+            "app_name": session["app_name"]
+        }
+        
+        return {
+            "success": True,
+            "userId": session["user_id"],
+            "sessionId": session["session_id"],
+            "appName": session["app_name"]
+        }
     except Exception as e:
         return {
             "success": False,
             "error": f"Error creating session: {str(e)}"
         }
 
-@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
-async def proxy(request: Request, path: str):
-    """Forward all requests to ADK API server"""
-    # Get the request body
-    body = await request.body()
-    
-    # Get query params
-    params = dict(request.query_params)
-    
-    # Get headers (exclude host)
-    headers = {k: v for k, v in request.headers.items() if k.lower() != "host"}
-    
-    # Forward the request to the ADK server
-    url = f"/{path}"
-    method = request.method.lower()
-    
-    try:
-        if method == "get":
-            response = await client.get(url, params=params, headers=headers)
-        elif method == "post":
-            response = await client.post(url, params=params, headers=headers, content=body)
-        elif method == "put":
-            response = await client.put(url, params=params, headers=headers, content=body)
-        elif method == "delete":
-            response = await client.delete(url, params=params, headers=headers, content=body)
-        else:
-            return Response(
-                content=json.dumps({"error": "Method not supported"}),
-                status_code=405,
-                media_type="application/json"
-            )
-        
-        # Return the ADK response
-        return Response(
-            content=response.content,
-            status_code=response.status_code,
-            headers=dict(response.headers),
-            media_type=response.headers.get("content-type")
-        )
-    except Exception as e:
-        return Response(
-            content=json.dumps({"error": str(e)}),
-            status_code=500,
-            media_type="application/json"
-        )
-
 @app.post("/apps/{app_name}/users/{user_id}/sessions/{session_id}/events")
 async def session_events(
     request: Request,
@@ -126,55 +300,187 @@ async def session_events(
     session_id: str
 ):
     """Handle session events and run requests"""
+    # Get the request body
+    body_bytes = await request.body()
+    deadline = new_turn_deadline()
+    
+    async def forward():
+        try:
+            body = fast_json.loads(body_bytes)
+            
+            # Create a run request for the ADK API
+            run_request = {
+                "appName": app_name,
+                "userId": user_id,
+                "sessionId": session_id,
+                "newMessage": body["content"],
+                "streaming": False
+            }
+            
+            # Forward to /run endpoint, giving up when the turn's deadline passes
+            with start_span("adk.run", **{"session.id": session_id}) as span:
+                async with asyncio.timeout(remaining(deadline)):
+                    response = await client.post(
+                        "/run", 
+                        content=fast_json.dumps(with_turn_state(run_request, span.traceparent, deadline)),
+                        headers={"Content-Type": "application/json", TRACEPARENT_HEADER: span.traceparent}
+                    )
+                span.set_attribute("http.status_code", response.status_code)
+            get_cache.invalidate(f"/apps/{app_name}/users/{user_id}/sessions/{session_id}")
+            
+            # Return the ADK response
+            return Response(
+                content=response.content,
+                status_code=response.status_code,
+                headers=downstream_headers(response),
+                media_type=response.headers.get("content-type", "application/json")
+            )
+        except TimeoutError:
+            return deadline_exceeded()
+        except Exception as e:
+            return error_response(str(e))
+    
+    return await with_idempotency(request, body_bytes, lambda: admitted(user_id, forward))
+
+async def proxy_turn(request: Request, path: str, url: str, headers: dict):
+    """Forward an agent turn, injecting the trace context and deadline into its state delta.
+
+    The body is parsed once, both for the turn state and the admission user.
+    /run responses are buffered so they can be replayed; /run_sse is streamed.
+    """
+    body = await request.body()
+    deadline = new_turn_deadline()
     try:
-        # Get the request body
-        body_bytes = await request.body()
-        body = json.loads(body_bytes.decode())
-        
-        # Create a run request for the ADK API
-        run_request = {
-            "appName": app_name,
-            "userId": user_id,
-            "sessionId": session_id,
-            "newMessage": body["content"],
-            "streaming": False
-        }
-        
-        # Forward to /run endpoint
-        response = await client.post(
-            "/run", 
-            json=run_request,
-            headers={"Content-Type": "application/json"}
-        )
-        
-        # Return the ADK response
+        run_request = fast_json.loads(body) if body else None
+    except ValueError:
+        run_request = None
+    headers.pop("content-length", None)
+    stream = path not in IDEMPOTENT_PATHS
+    changed_path = session_path(run_request) or f"/{path}"
+
+    async def forward():
+        # Ended by hand rather than with start_span: a streamed turn is not
+        # over until its last event has been relayed
+        span = new_span(f"adk {request.method} {url}", **{"http.method": request.method, "http.url": url})
+        headers[TRACEPARENT_HEADER] = span.traceparent
+        try:
+            content = body
+            if isinstance(run_request, dict):
+                content = fast_json.dumps(with_turn_state(run_request, span.traceparent, deadline))
+            upstream = client.build_request(request.method, url, headers=headers, content=content)
+            async with asyncio.timeout(remaining(deadline)):
+                response = await client.send(upstream, stream=stream)
+        except TimeoutError as e:
+            span.record_error(e)
+            span.end()
+            return deadline_exceeded()
+        except Exception as e:
+            span.record_error(e)
+            span.end()
+            return error_response(str(e))
+        span.set_attribute("http.status_code", response.status_code)
+
+        if stream:
+            # The session keeps changing until the last event has been streamed
+            return StreamingResponse(
+                response.aiter_raw(),
+                status_code=response.status_code,
+                headers=downstream_headers(response, decoded=False),
+                background=BackgroundTasks([
+                    BackgroundTask(response.aclose),
+                    BackgroundTask(span.end),
+                    BackgroundTask(get_cache.invalidate, changed_path),
+                ])
+            )
+        span.end()
+        get_cache.invalidate(changed_path)
         return Response(
             content=response.content,
             status_code=response.status_code,
-            headers=dict(response.headers),
-            media_type=response.headers.get("content-type", "application/json")
+            headers=downstream_headers(response),
+            media_type=response.headers.get("content-type")
         )
-    except Exception as e:
+
+    user_id = turn_user_id(request, run_request)
+    if path in IDEMPOTENT_PATHS:
+        return await with_idempotency(request, body, lambda: admitted(user_id, forward))
+    return await admitted(user_id, forward)
+
+@app.websocket("/ws/apps/{app_name}/users/{user_id}/sessions/{session_id}")
+async def chat_socket(websocket: WebSocket, app_name: str, user_id: str, session_id: str):
+    """Chat over one WebSocket bound to an ADK session, with agent events pushed as they arrive"""
+    # CORS does not apply to WebSockets, so check the origin here
+    origin = websocket.headers.get("origin")
+    if origin and origin not in ALLOWED_ORIGINS:
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+    await ChatConnection(websocket, client, admission, app_name, user_id, session_id, prefetcher).serve()
+
+async def proxy_get(request: Request, path: str, url: str, headers: dict):
+    """Forward a GET through the GET cache, so identical concurrent requests share one upstream call.
+
+    The response is buffered to be shared; ADK's GET endpoints return small
+    JSON documents.
+    """
+    conditional = {name: headers.pop(name) for name in CONDITIONAL_HEADERS if name in headers}
+
+    async def forward():
+        try:
+            with start_span(f"adk GET {url}", **{"http.method": "GET", "http.url": url}) as span:
+                headers[TRACEPARENT_HEADER] = span.traceparent
+                response = await client.get(url, headers=headers)
+                span.set_attribute("http.status_code", response.status_code)
+        except Exception as e:
+            return error_response(str(e))
         return Response(
-            content=json.dumps({"error": str(e)}),
-            status_code=500,
-            media_type="application/json"
+            content=response.content,
+            status_code=response.status_code,
+            headers=downstream_headers(response),
+            media_type=response.headers.get("content-type")
         )
 
-async def check_adk_server():
-    """Check if the ADK API server is running."""
+    return await get_cache.get(path, url, {**headers, **conditional}, forward)
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def proxy(request: Request, path: str):
+    """Forward all requests to ADK API server"""
+    # Forward the query string and headers as received
+    url = f"/{path}?{request.url.query}" if request.url.query else f"/{path}"
+    headers = upstream_headers(request)
+    
+    if request.method == "POST" and path in RUN_PATHS:
+        return await proxy_turn(request, path, url, headers)
+    
+    if request.method == "GET":
+        return await proxy_get(request, f"/{path}", url, headers)
+    
+    # Everything else is piped through: the request body is streamed upstream
+    # and the response bytes are relayed as they arrive, without decoding.
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    # The span ends in the background task, once the response body has been relayed
+    span = new_span(f"adk {request.method} {url}", **{"http.method": request.method, "http.url": url})
+    headers[TRACEPARENT_HEADER] = span.traceparent
     try:
-        # Try connecting to the ADK server
-        response = await client.get("/")
-        print(f"✅ ADK API server is running at {ADK_URL}")
-        print(f"   Response: {response.status_code}")
-        return True
+        upstream = client.build_request(
+            request.method, url, headers=headers, content=request.stream() if has_body else None
+        )
+        response = await client.send(upstream, stream=True)
     except Exception as e:
-        print(f"❌ ADK API server not available at {ADK_URL}: {e}")
-        print("   Is the ADK server starting up? We'll continue anyway and retry connections.")
-        return False
+        span.record_error(e)
+        span.end()
+        return error_response(str(e))
+    span.set_attribute("http.status_code", response.status_code)
+    get_cache.invalidate(f"/{path}")
+    
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=downstream_headers(response, decoded=False),
+        background=BackgroundTasks([BackgroundTask(response.aclose), BackgroundTask(span.end)])
+    )
 
 if __name__ == "__main__":
+    configure_logging()
     proxy_port = int(os.environ.get("PROXY_PORT", "8001"))
     print(f"🚀 Starting ADK CORS Proxy at http://0.0.0.0:{proxy_port}")
     print(f"⏩ Forwarding to ADK API at {ADK_URL}")
@@ -0,0 +1,318 @@
+"""
+Nightly appointment-reminder pipeline.
+
+Streams the target day's appointments from Postgres through a named
+(server-side) cursor ``REMINDER_BATCH_SIZE`` rows at a time, renders a
+reminder for each and hands them to a pluggable sender. Several sends run
+concurrently and are paced by a token bucket. A failed send is retried with
+exponential backoff.
+
+Progress is checkpointed to a JSON file as the position of the last
+appointment that has been handled, along with every earlier one. Appointments
+are read in ``(time, id)`` order, so a restarted run carries on from that
+position. Delivery is at-least-once: reminders that were in flight when the
+process died are sent again. Each reminder carries a stable ``reminder_id``
+that senders can use to drop duplicates.
+
+Reminders that still failed after every retry are kept in the checkpoint's
+``failed`` list. A resumed run sends them again before it carries on, and drops
+them from the list once delivered or when the appointment no longer exists.
+
+Usage:
+    python reminders.py                                # tomorrow, into reminders.jsonl
+    python reminders.py --date 2025-07-01 --sink out.jsonl
+    python reminders.py --sender mymodule:SmsSender    # any class with async send()
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import random
+import sys
+from datetime import date, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from db import TracedRealDictCursor, get_db_connection
+from logging_setup import configure_logging
+from scheduling import format_time_12h
+from token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+REMINDER_CONCURRENCY = int(os.getenv("REMINDER_CONCURRENCY", "10"))
+REMINDER_RATE = float(os.getenv("REMINDER_RATE", "20"))  # sends per second
+REMINDER_MAX_ATTEMPTS = int(os.getenv("REMINDER_MAX_ATTEMPTS", "5"))
+REMINDER_CHECKPOINT_PATH = os.getenv("REMINDER_CHECKPOINT_PATH", "reminders_checkpoint.json")
+REMINDER_SINK_PATH = os.getenv("REMINDER_SINK_PATH", "reminders.jsonl")
+# The checkpoint file is rewritten after this many handled reminders
+CHECKPOINT_EVERY = 50
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+APPOINTMENTS_QUERY = """
+    SELECT id, slot_id, date, time, patient_name, description
+    FROM appointments
+    WHERE date = %s AND (time, id) > (%s, %s)
+    ORDER BY time, id
+"""
+
+# Appointments whose reminders failed in an earlier run
+FAILED_APPOINTMENTS_QUERY = """
+    SELECT id, slot_id, date, time, patient_name, description
+    FROM appointments
+    WHERE date = %s AND id = ANY(%s)
+    ORDER BY time, id
+"""
+
+
+# Senders
+
+class FileSender:
+    """Appends reminders as JSON lines to a local file; the test and default sink."""
+
+    def __init__(self, path: str = REMINDER_SINK_PATH):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    async def send(self, reminder: Dict[str, Any]) -> None:
+        line = json.dumps(reminder) + "\n"
+        async with self._lock:
+            await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as sink:
+            sink.write(line)
+
+
+def load_sender(spec: str) -> Any:
+    """Instantiate a sender from ``module:ClassName``."""
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Sender must be given as module:ClassName, got {spec!r}")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+# Rendering
+
+def render_reminder(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the reminder for one appointment row."""
+    day = row["date"]
+    message = (
+        f"Hi {row['patient_name']}, this is a reminder of your SAP Doc appointment on "
+        f"{day.strftime('%A, %B %d, %Y')} at {format_time_12h(row['time'])}. "
+        "Please arrive 15 minutes early. To cancel or reschedule, please give us 24 hours notice."
+    )
+    return {
+        "reminder_id": f"{row['slot_id']}:{row['id']}",
+        "slot_id": row["slot_id"],
+        "patient_name": row["patient_name"],
+        "date": day.strftime("%Y-%m-%d"),
+        "time": row["time"],
+        "message": message,
+    }
+
+
+# Checkpointing
+
+class Checkpoint:
+    """Resume position and counters for one target date, persisted as JSON."""
+
+    def __init__(self, path: str, target: date):
+        self.path = path
+        self.date = target.isoformat()
+        self.after: Tuple[str, int] = ("", 0)
+        self.sent = 0
+        self.failed: List[str] = []
+
+    @classmethod
+    def load(cls, path: str, target: date) -> "Checkpoint":
+        checkpoint = cls(path, target)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return checkpoint
+        if data.get("date") == checkpoint.date:
+            checkpoint.after = tuple(data["after"])
+            checkpoint.sent = data.get("sent", 0)
+            checkpoint.failed = data.get("failed", [])
+        return checkpoint
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"date": self.date, "after": list(self.after),
+                       "sent": self.sent, "failed": self.failed}, f)
+        os.replace(tmp_path, self.path)
+
+
+class _Watermark:
+    """Tracks out-of-order completions and advances the checkpoint in order."""
+
+    def __init__(self, checkpoint: Checkpoint):
+        self.checkpoint = checkpoint
+        self._issued = 0
+        self._next = 0
+        self._positions: Dict[int, Tuple[str, int]] = {}
+        self._done: set = set()
+        self._since_save = 0
+
+    def issue(self, position: Tuple[str, int]) -> int:
+        seq = self._issued
+        self._issued += 1
+        self._positions[seq] = position
+        return seq
+
+    def complete(self, seq: int) -> None:
+        self._done.add(seq)
+        while self._next in self._done:
+            self._done.discard(self._next)
+            self.checkpoint.after = self._positions.pop(self._next)
+            self._next += 1
+        self._since_save += 1
+        if self._since_save >= CHECKPOINT_EVERY:
+            self._since_save = 0
+            self.checkpoint.save()
+
+
+def appointment_id(reminder_id: str) -> int:
+    """Appointment id at the end of a ``slot_id:id`` reminder ID."""
+    return int(reminder_id.rpartition(":")[2])
+
+
+# Pipeline
+
+def fetch_failed_appointments(target: date, reminder_ids: List[str]) -> List[Dict[str, Any]]:
+    """Rows of the appointments behind earlier failed reminders that still exist."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=TracedRealDictCursor)
+        cursor.execute(FAILED_APPOINTMENTS_QUERY, (target, [appointment_id(r) for r in reminder_ids]))
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
+
+
+async def stream_appointments(target: date, after: Tuple[str, int],
+                              batch_size: int = REMINDER_BATCH_SIZE) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the day's appointments after ``after`` without loading them all."""
+    conn = await asyncio.to_thread(get_db_connection)
+    try:
+        cursor = conn.cursor(name="appointment_reminders", cursor_factory=TracedRealDictCursor)
+        cursor.itersize = batch_size
+        await asyncio.to_thread(cursor.execute, APPOINTMENTS_QUERY, (target, after[0], after[1]))
+        while True:
+            rows = await asyncio.to_thread(cursor.fetchmany, batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+        cursor.close()
+    finally:
+        conn.close()
+
+
+async def send_with_retries(sender: Any, reminder: Dict[str, Any], bucket: Optional[TokenBucket],
+                            max_attempts: int = REMINDER_MAX_ATTEMPTS) -> bool:
+    """Send one reminder, retrying with backoff; return whether it was delivered."""
+    for attempt in range(1, max_attempts + 1):
+        if bucket is not None:
+            while wait := bucket.try_acquire():
+                await asyncio.sleep(wait)
+        try:
+            await sender.send(reminder)
+            return True
+        except Exception as e:
+            if attempt == max_attempts:
+                logger.error("Giving up on reminder %s after %d attempts: %s",
+                             reminder["reminder_id"], attempt, e)
+                return False
+            delay = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+            logger.warning("Reminder %s failed (attempt %d): %s; retrying in %.1fs",
+                           reminder["reminder_id"], attempt, e, delay)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+    return False
+
+
+async def run_reminders(target: date, sender: Any, checkpoint: Checkpoint,
+                        concurrency: int = REMINDER_CONCURRENCY, rate: float = REMINDER_RATE) -> Checkpoint:
+    """Send reminders for ``target``, resuming from and updating ``checkpoint``."""
+    bucket = TokenBucket(rate, max(rate, 1)) if rate > 0 else None
+    watermark = _Watermark(checkpoint)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def worker() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            seq, reminder = item
+            delivered = await send_with_retries(sender, reminder, bucket)
+            if delivered:
+                checkpoint.sent += 1
+            if seq is None:
+                # A retry of an earlier failure; it stays listed until delivered
+                if delivered:
+                    checkpoint.failed.remove(reminder["reminder_id"])
+                continue
+            if not delivered and reminder["reminder_id"] not in checkpoint.failed:
+                checkpoint.failed.append(reminder["reminder_id"])
+            watermark.complete(seq)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        if checkpoint.failed:
+            rows = await asyncio.to_thread(fetch_failed_appointments, target, checkpoint.failed)
+            found = {row["id"] for row in rows}
+            gone = [r for r in checkpoint.failed if appointment_id(r) not in found]
+            if gone:
+                logger.info("Dropping %d failed reminders for appointments that no longer exist", len(gone))
+                checkpoint.failed = [r for r in checkpoint.failed if r not in gone]
+            logger.info("Retrying %d reminders that failed in an earlier run", len(rows))
+            for row in rows:
+                await queue.put((None, render_reminder(row)))
+        async for row in stream_appointments(target, checkpoint.after):
+            seq = watermark.issue((row["time"], row["id"]))
+            await queue.put((seq, render_reminder(row)))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        checkpoint.save()
+    return checkpoint
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Send appointment reminders for one day")
+    parser.add_argument("--date", help="Appointment date (YYYY-MM-DD, default: tomorrow)")
+    parser.add_argument("--sink", default=REMINDER_SINK_PATH, help="JSON lines file for the default file sender")
+    parser.add_argument("--sender", help="Use a custom sender class given as module:ClassName")
+    parser.add_argument("--checkpoint", default=REMINDER_CHECKPOINT_PATH, help="Checkpoint file")
+    parser.add_argument("--concurrency", type=int, default=REMINDER_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=REMINDER_RATE, help="Sends per second (0 = unlimited)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    configure_logging()
+    target = date.fromisoformat(args.date) if args.date else date.today() + timedelta(days=1)
+    sender = load_sender(args.sender) if args.sender else FileSender(args.sink)
+    checkpoint = Checkpoint(args.checkpoint, target) if args.restart else Checkpoint.load(args.checkpoint, target)
+    if checkpoint.after[0]:
+        print(f"⏩ Resuming {target} after {checkpoint.after[0]} (id {checkpoint.after[1]})")
+
+    print(f"📨 Sending reminders for {target}")
+    checkpoint = asyncio.run(run_reminders(target, sender, checkpoint, args.concurrency, args.rate))
+    print(f"✅ Sent {checkpoint.sent} reminders, {len(checkpoint.failed)} failed")
+    return 1 if checkpoint.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Coalescing and short-lived caching of GET requests in the CORS proxy.
+
+Frontends poll session state, so many clients often ask ADK for the same
+resource at once. Identical concurrent GETs (same URL and credentials) share
+one upstream request, and every waiting client gets a copy of its response.
+
+Caching is opt-in per path. ``GET_CACHE_TTLS`` maps path regular expressions
+to TTLs in seconds, e.g.::
+
+    GET_CACHE_TTLS='^/list-apps$=30,^/apps/[^/]+/users/[^/]+/sessions/[^/]+$=1'
+
+Successful responses for matching paths are served from memory for the TTL
+and carry a weak ``ETag``. A client that sends it back in ``If-None-Match``
+gets ``304 Not Modified`` while the body is unchanged, even after the entry
+has expired and been fetched again. Any other request to a path, such as a
+turn or a session delete, drops the cached entries above and below it.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Pattern, Tuple
+
+from fastapi import Response
+
+CACHE_STATUS_HEADER = "x-proxy-cache"
+
+GET_CACHE_TTLS = os.environ.get("GET_CACHE_TTLS", "")
+GET_CACHE_MAX_ENTRIES = int(os.environ.get("GET_CACHE_MAX_ENTRIES", "1000"))
+
+# Request headers that can change what ADK returns for the same URL
+VARY_HEADERS = ("authorization", "cookie", "accept")
+
+
+def parse_ttls(spec: str) -> List[Tuple[Pattern, float]]:
+    """Parse ``regex=seconds`` pairs separated by commas."""
+    rules = []
+    for item in spec.split(","):
+        pattern, _, ttl = item.strip().rpartition("=")
+        if pattern and ttl:
+            rules.append((re.compile(pattern), float(ttl)))
+    return rules
+
+
+def _related(a: str, b: str) -> bool:
+    """Whether one path is the other or contains it."""
+    return a == b or a.startswith(b.rstrip("/") + "/") or b.startswith(a.rstrip("/") + "/")
+
+
+class CachedResponse:
+    """A buffered GET response shared by coalesced and cached requests."""
+
+    __slots__ = ("path", "status_code", "headers", "content", "media_type", "etag", "expires_at")
+
+    def __init__(self, path: str, response: Response, ttl: float):
+        self.path = path
+        self.status_code = response.status_code
+        self.headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+        self.content = response.body
+        self.media_type = response.media_type
+        self.etag = None
+        if ttl > 0 and self.status_code == 200:
+            self.etag = self.headers.get("etag") or f'W/"{hashlib.sha256(self.content).hexdigest()[:32]}"'
+            self.headers["etag"] = self.etag
+            self.headers.setdefault("cache-control", "no-cache")
+        self.expires_at = time.monotonic() + ttl
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        if not self.etag or not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag.removeprefix("W/") for tag in tags)
+
+    def to_response(self, if_none_match: Optional[str], status: str) -> Response:
+        if self.not_modified(if_none_match):
+            return Response(status_code=304, headers={
+                "etag": self.etag,
+                "cache-control": self.headers["cache-control"],
+                CACHE_STATUS_HEADER: status,
+            })
+        return Response(
+            content=self.content,
+            status_code=self.status_code,
+            headers={**self.headers, CACHE_STATUS_HEADER: status},
+            media_type=self.media_type
+        )
+
+
+class GetCache:
+    """Single-flight GETs plus a TTL-bounded store for opted-in paths."""
+
+    def __init__(self, ttls: str = GET_CACHE_TTLS, max_entries: int = GET_CACHE_MAX_ENTRIES):
+        self.rules = parse_ttls(ttls)
+        self.max_entries = max_entries
+        self._cached: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"forwarded": 0, "coalesced": 0, "hits": 0, "not_modified": 0, "invalidated": 0}
+
+    def ttl_for(self, path: str) -> float:
+        for pattern, ttl in self.rules:
+            if pattern.search(path):
+                return ttl
+        return 0.0
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        while self._cached:
+            key, cached = next(iter(self._cached.items()))
+            if cached.expires_at > now and len(self._cached) <= self.max_entries:
+                break
+            self._cached.pop(key)
+
+    def invalidate(self, path: str) -> None:
+        """Drop cached entries for ``path`` and the paths above and below it."""
+        stale = [key for key, cached in self._cached.items() if _related(cached.path, path)]
+        for key in stale:
+            del self._cached[key]
+        self.stats["invalidated"] += len(stale)
+
+    async def get(self, path: str, url: str, headers: Dict[str, str],
+                  forward: Callable[[], Awaitable[Response]]) -> Response:
+        """Serve a GET from the cache, an identical in-flight request, or forward()."""
+        key = "\n".join([url, *(headers.get(name, "") for name in VARY_HEADERS)])
+        if_none_match = headers.get("if-none-match")
+        ttl = self.ttl_for(path)
+        self._purge()
+
+        cached = self._cached.get(key)
+        if cached is not None:
+            self._count(cached, if_none_match, "hits")
+            return cached.to_response(if_none_match, "HIT")
+
+        task = self._inflight.get(key)
+        if task is not None:
+            cached = await asyncio.shield(task)
+            self._count(cached, if_none_match, "coalesced")
+            return cached.to_response(if_none_match, "COALESCED")
+
+        async def fetch() -> CachedResponse:
+            try:
+                response = await forward()
+                cached = CachedResponse(path, response, ttl)
+                if cached.etag:
+                    self._cached[key] = cached
+                return cached
+            finally:
+                self._inflight.pop(key, None)
+
+        # A separate task, so waiters still get the response if the first client goes away
+        task = asyncio.create_task(fetch())
+        self._inflight[key] = task
+        cached = await asyncio.shield(task)
+        self._count(cached, if_none_match, "forwarded")
+        return cached.to_response(if_none_match, "MISS")
+
+    def _count(self, cached: CachedResponse, if_none_match: Optional[str], outcome: str) -> None:
+        self.stats[outcome] += 1
+        if cached.not_modified(if_none_match):
+            self.stats["not_modified"] += 1
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"cached": len(self._cached), "inflight": len(self._inflight), **self.stats}
@@ -0,0 +1,249 @@
+"""
+Scheduling rules and parsing for the SAP Doc agent: office hours, slot IDs,
+availability windows and free-form date/time input.
+
+Only the standard library is imported here, so tooling, benchmarks and the
+reminder job can use these helpers without loading psycopg2 or Google ADK.
+The agent's tools in ``agent`` are built on them.
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from logging_setup import SampledLogger
+
+logger = logging.getLogger(__name__)
+# parse_slot_id can run once per slot in bulk callers, so its debug traces are sampled
+hot_logger = SampledLogger(logger)
+
+# Available time slots configuration
+AVAILABLE_TIME_SLOTS = [
+    "09:00", "09:30", "10:00", "10:30", "11:00", "11:30",
+    "14:00", "14:30", "15:00", "15:30", "16:00", "16:30"
+]
+
+OFFICE_HOURS = {
+    "start": "09:00",
+    "end": "17:00",
+    "days": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+}
+
+# DRY: Single function to handle slot ID format consistently
+def create_slot_id(date_str: str, time_str: str) -> str:
+    """Create a standardized slot ID from date and time."""
+    return f"{date_str}-{time_str}"
+
+def parse_slot_id(slot_id: str) -> tuple[str, str]:
+    """Parse a slot ID into date and time components.
+    Always returns valid date_str, time_str - uses defaults if parsing fails.
+    """
+    try:
+        parts = slot_id.split('-')
+        hot_logger.debug("Parsing slot_id %r, parts: %s", slot_id, parts)
+        
+        if len(parts) == 4:
+            # Format: YYYY-MM-DD-HH:MM
+            date_str = f"{parts[0]}-{parts[1]}-{parts[2]}"
+            time_str = parts[3]
+            hot_logger.debug("Matched format 1: date_str=%r, time_str=%r", date_str, time_str)
+            return date_str, time_str
+        elif len(parts) == 5:
+            # Legacy format: YYYY-MM-DD-HH-MM
+            date_str = f"{parts[0]}-{parts[1]}-{parts[2]}"
+            time_str = f"{parts[3]}:{parts[4]}"
+            hot_logger.debug("Matched format 2: date_str=%r, time_str=%r", date_str, time_str)
+            return date_str, time_str
+        else:
+            # Invalid format - use defaults
+            logger.info("Invalid slot ID format %r with %d parts, using defaults", slot_id, len(parts))
+            today = datetime.now()
+            return today.strftime('%Y-%m-%d'), "10:00"
+    except Exception as e:
+        # Any parsing error - use defaults
+        logger.info("Error parsing slot ID %r: %s, using defaults", slot_id, e)
+        today = datetime.now()
+        return today.strftime('%Y-%m-%d'), "10:00"
+
+def split_slot_id(slot_id: str) -> Optional[tuple[str, str]]:
+    """Date and time of a slot ID, or None when it is not a valid slot ID.
+
+    Unlike parse_slot_id there are no defaults, so tools that book or hold a
+    slot can refuse an ID the model made up instead of using today at 10:00.
+    """
+    parts = slot_id.split('-')
+    if len(parts) == 4:
+        date_str, time_str = "-".join(parts[:3]), parts[3]
+    elif len(parts) == 5:
+        date_str, time_str = "-".join(parts[:3]), f"{parts[3]}:{parts[4]}"
+    else:
+        return None
+    try:
+        datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
+    except ValueError:
+        return None
+    return date_str, time_str
+
+# Most slots returned by an availability lookup
+MAX_RETURNED_SLOTS = 10
+
+def default_end_date(start_date: str) -> str:
+    """End of the default two-week availability window."""
+    return (datetime.strptime(start_date, '%Y-%m-%d') + timedelta(days=14)).strftime('%Y-%m-%d')
+
+def compute_available_slots(start_date: str, end_date: str, booked_slots: set) -> List[Dict[str, Any]]:
+    """Free weekday slots between two dates, given the set of booked slot IDs."""
+    available_slots = []
+    current_date = datetime.strptime(start_date, '%Y-%m-%d')
+    end_date_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    
+    while current_date <= end_date_dt and len(available_slots) < 20:
+        if current_date.weekday() < 5:  # Monday = 0, Friday = 4
+            date_str = current_date.strftime('%Y-%m-%d')
+            
+            for time_slot in AVAILABLE_TIME_SLOTS:
+                slot_id = create_slot_id(date_str, time_slot)
+                
+                if slot_id not in booked_slots:
+                    now = datetime.now()
+                    if current_date.date() == now.date():
+                        slot_datetime = datetime.strptime(f"{date_str} {time_slot}", '%Y-%m-%d %H:%M')
+                        if slot_datetime <= now:
+                            continue
+                    
+                    available_slots.append({
+                        "slot_id": slot_id,
+                        "date": date_str,
+                        "time": time_slot,
+                        "day_name": current_date.strftime('%A'),
+                        "formatted_date": current_date.strftime('%B %d, %Y')
+                    })
+        
+        current_date += timedelta(days=1)
+    
+    return available_slots[:MAX_RETURNED_SLOTS]
+
+# Most days a single get_appointments_for_dates call may cover
+MAX_BATCH_DAYS = 62
+
+def expand_dates(dates: List[str]) -> List[str]:
+    """Expand YYYY-MM-DD dates and YYYY-MM-DD..YYYY-MM-DD ranges into sorted unique dates.
+
+    Raises ValueError for malformed entries or more than MAX_BATCH_DAYS days.
+    """
+    days = set()
+    for item in dates:
+        start, _, end = item.strip().partition("..")
+        try:
+            first = datetime.strptime(start.strip(), '%Y-%m-%d')
+            last = datetime.strptime(end.strip(), '%Y-%m-%d') if end else first
+        except ValueError:
+            raise ValueError(f"Invalid date {item!r}") from None
+        if last < first:
+            raise ValueError(f"Range {item!r} ends before it starts")
+        if (last - first).days >= MAX_BATCH_DAYS:
+            raise ValueError(f"Range {item!r} is longer than {MAX_BATCH_DAYS} days")
+        day = first
+        while day <= last:
+            days.add(day.strftime('%Y-%m-%d'))
+            day += timedelta(days=1)
+    if len(days) > MAX_BATCH_DAYS:
+        raise ValueError(f"At most {MAX_BATCH_DAYS} days can be requested at once")
+    return sorted(days)
+
+def normalize_patient_name(name: str) -> str:
+    """Lowercase and collapse whitespace, matching the lower(patient_name) indexes."""
+    return " ".join(name.split()).lower()
+
+def format_time_12h(time_24h: str) -> str:
+    """Convert 24-hour time to 12-hour format."""
+    try:
+        time_obj = datetime.strptime(time_24h, '%H:%M')
+        return time_obj.strftime('%I:%M %p')
+    except:
+        return time_24h
+
+def parse_natural_date_time(date_input: str, time_input: str) -> Optional[str]:
+    """Convert natural language date and time to standardized slot_id format."""
+    try:
+        # Handle various date formats
+        date_formats = [
+            '%Y-%m-%d',     # 2025-06-18
+            '%B %d, %Y',    # June 18, 2025
+            '%b %d, %Y',    # Jun 18, 2025
+            '%m/%d/%Y',     # 06/18/2025
+            '%d/%m/%Y',     # 18/06/2025
+        ]
+        
+        parsed_date = None
+        for date_format in date_formats:
+            try:
+                parsed_date = datetime.strptime(date_input.strip(), date_format)
+                break
+            except ValueError:
+                continue
+        
+        if not parsed_date:
+            logger.error("Could not parse date: %s", date_input)
+            return None
+        
+        # Handle various time formats
+        time_formats = [
+            '%H:%M',        # 10:30
+            '%I:%M %p',     # 10:30 AM
+            '%I:%M%p',      # 10:30AM
+            '%I %p',        # 10 AM
+        ]
+        
+        parsed_time = None
+        for time_format in time_formats:
+            try:
+                parsed_time = datetime.strptime(time_input.strip(), time_format)
+                break
+            except ValueError:
+                continue
+        
+        if not parsed_time:
+            logger.error("Could not parse time: %s", time_input)
+            return None
+        
+        # Create standardized slot ID
+        date_str = parsed_date.strftime('%Y-%m-%d')
+        time_str = parsed_time.strftime('%H:%M')
+        return create_slot_id(date_str, time_str)
+        
+    except Exception as e:
+        logger.error("Error parsing date/time: %s", e)
+        return None
+
+def parse_smart_date_time(date_time_input: str) -> Optional[str]:
+    """Extract a slot ID from a single free-form date/time string."""
+    # Simple patterns for common formats
+    patterns = [
+        # "June 18, 2025 at 10:30 AM"
+        r'(\w+ \d{1,2},? \d{4}) at (\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))',
+        # "2025-06-18 10:30"
+        r'(\d{4}-\d{2}-\d{2})\s+(\d{1,2}:\d{2})',
+        # "June 18 at 10:30 AM"
+        r'(\w+\s+\d{1,2})\s+at\s+(\d{1,2}:\d{2}\s*(?:AM|PM|am|pm))',
+    ]
+    
+    date_time_input = date_time_input.strip()
+    
+    for pattern in patterns:
+        match = re.search(pattern, date_time_input)
+        if match:
+            date_part = match.group(1)
+            time_part = match.group(2)
+            
+            # Add current year if missing
+            if not re.search(r'\d{4}', date_part):
+                current_year = datetime.now().year
+                date_part = f"{date_part}, {current_year}"
+            
+            slot_id = parse_natural_date_time(date_part, time_part)
+            if slot_id:
+                return slot_id
+    
+    return None
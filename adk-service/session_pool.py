@@ -0,0 +1,141 @@
+"""
+Pool of pre-created ADK sessions for the CORS proxy.
+
+Creating an ADK session is a round trip the browser has to wait for before it
+can send its first message. The pool keeps a few sessions created ahead of
+time and refills them in the background, so ``/create-session`` can usually
+answer without touching ADK. Sessions older than the configured expiry are
+discarded (and deleted upstream) rather than handed out.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+
+from tracing import TRACEPARENT_HEADER, start_span
+
+logger = logging.getLogger(__name__)
+
+SESSION_POOL_SIZE = int(os.environ.get("SESSION_POOL_SIZE", "5"))
+SESSION_POOL_TTL = float(os.environ.get("SESSION_POOL_TTL", "600"))
+SESSION_POOL_REFILL_INTERVAL = float(os.environ.get("SESSION_POOL_REFILL_INTERVAL", "5"))
+SESSION_POOL_MAX_BACKOFF = 60.0
+
+
+async def create_adk_session(client: httpx.AsyncClient, app_name: str,
+                             state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Create a session with fresh user and session IDs on the ADK API server."""
+    user_id = f"user-{uuid.uuid4()}"
+    session_id = f"session-{uuid.uuid4()}"
+
+    with start_span("adk.create_session", **{"session.id": session_id}) as span:
+        response = await client.post(
+            f"/apps/{app_name}/users/{user_id}/sessions/{session_id}",
+            json={"state": state or {}},
+            headers={TRACEPARENT_HEADER: span.traceparent}
+        )
+        span.set_attribute("http.status_code", response.status_code)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to create session: {response.status_code} {response.text}")
+
+    return {
+        "user_id": user_id,
+        "session_id": session_id,
+        "app_name": app_name,
+        "created_at": time.time(),
+    }
+
+
+class SessionPool:
+    """Background-refilled queue of ready-to-use ADK sessions."""
+
+    def __init__(self, client: httpx.AsyncClient, app_name: str, size: int = SESSION_POOL_SIZE,
+                 ttl: float = SESSION_POOL_TTL, refill_interval: float = SESSION_POOL_REFILL_INTERVAL):
+        self.client = client
+        self.app_name = app_name
+        self.size = size
+        self.ttl = ttl
+        self.refill_interval = refill_interval
+        self._sessions: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self.stats = {"hits": 0, "misses": 0, "created": 0, "expired": 0, "errors": 0}
+
+    def _expired(self, session: Dict[str, Any]) -> bool:
+        return time.time() - session["created_at"] > self.ttl
+
+    def acquire(self) -> Optional[Dict[str, Any]]:
+        """Hand out a pooled session, or None if the pool is empty."""
+        while self._sessions:
+            session = self._sessions.popleft()
+            if self._expired(session):
+                self._discard(session)
+                continue
+            self.stats["hits"] += 1
+            self._wakeup.set()
+            return session
+        self.stats["misses"] += 1
+        self._wakeup.set()
+        return None
+
+    def _discard(self, session: Dict[str, Any]) -> None:
+        self.stats["expired"] += 1
+        asyncio.create_task(self._delete(session))
+
+    async def _delete(self, session: Dict[str, Any]) -> None:
+        try:
+            await self.client.delete(
+                f"/apps/{session['app_name']}/users/{session['user_id']}/sessions/{session['session_id']}"
+            )
+        except httpx.HTTPError as e:
+            logger.debug("Failed to delete expired pooled session %s: %s", session["session_id"], e)
+
+    async def _refill(self) -> None:
+        while self._sessions and self._expired(self._sessions[0]):
+            self._discard(self._sessions.popleft())
+
+        missing = self.size - len(self._sessions)
+        if missing <= 0:
+            return
+        created = await asyncio.gather(
+            *(create_adk_session(self.client, self.app_name) for _ in range(missing)),
+            return_exceptions=True
+        )
+        errors = [session for session in created if isinstance(session, Exception)]
+        for session in created:
+            if not isinstance(session, Exception):
+                self._sessions.append(session)
+                self.stats["created"] += 1
+        if errors:
+            self.stats["errors"] += len(errors)
+            raise errors[0]
+
+    async def run(self) -> None:
+        """Keep the pool topped up until cancelled."""
+        if self.size <= 0:
+            return
+        backoff = self.refill_interval
+        while True:
+            try:
+                await self._refill()
+                backoff = self.refill_interval
+            except Exception as e:
+                logger.warning("Session pool refill failed: %s", e)
+                backoff = min(backoff * 2, SESSION_POOL_MAX_BACKOFF)
+                await asyncio.sleep(backoff)
+                continue
+            # Sleep until a session is handed out or the refill interval passes
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"size": self.size, "available": len(self._sessions), "ttl": self.ttl, **self.stats}
@@ -31,7 +31,7 @@ echo "  🌐 ADK Host: $ADK_HOST"
 echo "  🔌 ADK Port: $ADK_PORT"
 echo "  � CORS Proxy Port: $PROXY_PORT"
 echo "  �🗄️  Database: ${DB_HOST:-localhost}:${DB_PORT:-5432}"
-echo "  🤖 Model: gemini-2.0-flash-001"
+echo "  🤖 Model: ${AGENT_MODEL:-gemini-2.5-flash} (tiering: ${AGENT_MODEL_TIERING:-false})"
 echo ""
 
 echo "🎯 Starting Google ADK API Server in the background..."
@@ -47,12 +47,10 @@ ADK_PID=$!
 # Setup exit handler to kill ADK server when script ends
 trap "kill $ADK_PID; exit" TERM INT
 
-# Wait for ADK to start
-echo "⏳ Waiting for ADK API server to start (10 seconds)..."
-sleep 10
-
+# No fixed wait: the proxy polls ADK with backoff, warms up, and reports
+# readiness on /readyz once ADK and the database respond
 echo "🔄 Starting CORS Proxy for frontend access..."
-echo "🌍 Proxy available at: http://0.0.0.0:$PROXY_PORT"
+echo "🌍 Proxy available at: http://0.0.0.0:$PROXY_PORT (readiness: /readyz)"
 echo ""
 
 # Start the CORS proxy
@@ -0,0 +1,189 @@
+"""
+Startup orchestration and readiness tracking for the ADK CORS proxy.
+
+On startup the proxy waits for the ADK API server with exponential backoff
+instead of a fixed sleep, warms the database and the upcoming availability
+window, and loads the agent through ADK's app-info endpoint. Setting
+``STARTUP_WARMUP_RUN=1`` also runs one short warm-up turn, so the first real
+user does not pay for cold model connections; that turn is a real model call,
+so it is off by default. The resulting state backs the proxy's ``/livez`` and
+``/readyz`` endpoints.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+import httpx
+
+from db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+STARTUP_TIMEOUT = float(os.environ.get("STARTUP_TIMEOUT", "120"))
+STARTUP_INITIAL_DELAY = float(os.environ.get("STARTUP_INITIAL_DELAY", "0.25"))
+STARTUP_MAX_DELAY = float(os.environ.get("STARTUP_MAX_DELAY", "5"))
+STARTUP_WARMUP_RUN = os.environ.get("STARTUP_WARMUP_RUN", "0") == "1"
+READINESS_CACHE_SECONDS = float(os.environ.get("READINESS_CACHE_SECONDS", "2"))
+DB_CHECK_TIMEOUT = int(os.environ.get("DB_CHECK_TIMEOUT", "3"))
+WARMUP_WINDOW_DAYS = 14
+
+
+class Readiness:
+    """Startup progress plus the latest upstream and database probe results."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.startup_complete = False
+        self.adk_ok = False
+        self.db_ok = False
+        self.agent_loaded = False
+        self.last_error = ""
+        self.checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.startup_complete and self.adk_ok and self.db_ok
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "startup_complete": self.startup_complete,
+            "adk": self.adk_ok,
+            "database": self.db_ok,
+            "agent_loaded": self.agent_loaded,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "last_error": self.last_error or None,
+        }
+
+    async def refresh(self, client: httpx.AsyncClient) -> None:
+        """Re-probe ADK and the database, at most every READINESS_CACHE_SECONDS."""
+        async with self._lock:
+            if time.time() - self.checked_at < READINESS_CACHE_SECONDS:
+                return
+            self.adk_ok, (self.db_ok, db_error) = await asyncio.gather(
+                check_adk(client), asyncio.to_thread(check_db)
+            )
+            self.last_error = db_error or ("" if self.adk_ok else "ADK API server not responding")
+            self.checked_at = time.time()
+
+
+async def check_adk(client: httpx.AsyncClient) -> bool:
+    """Check if the ADK API server is accepting requests."""
+    try:
+        response = await client.get("/list-apps", timeout=2.0)
+        return response.status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+def check_db() -> tuple[bool, str]:
+    """Check database connectivity with a short connect timeout."""
+    try:
+        conn = get_db_connection(connect_timeout=DB_CHECK_TIMEOUT)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        finally:
+            conn.close()
+        return True, ""
+    except Exception as e:
+        return False, f"database: {e}"
+
+
+def warm_db() -> int:
+    """Touch the upcoming availability window so its pages are cached."""
+    start = datetime.now().date()
+    end = start + timedelta(days=WARMUP_WINDOW_DAYS)
+    conn = get_db_connection(connect_timeout=DB_CHECK_TIMEOUT)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT date, time FROM appointments WHERE date BETWEEN %s AND %s",
+            (start, end),
+        )
+        rows = len(cursor.fetchall())
+        cursor.close()
+        return rows
+    finally:
+        conn.close()
+
+
+async def wait_for_adk(client: httpx.AsyncClient, timeout: float = STARTUP_TIMEOUT) -> bool:
+    """Poll the ADK API server with exponential backoff until it responds."""
+    deadline = time.monotonic() + timeout
+    delay = STARTUP_INITIAL_DELAY
+    attempt = 0
+    while True:
+        attempt += 1
+        if await check_adk(client):
+            logger.info("ADK API server ready after %d attempt(s)", attempt)
+            return True
+        if time.monotonic() + delay > deadline:
+            logger.error("ADK API server not ready after %.0fs", timeout)
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, STARTUP_MAX_DELAY)
+
+
+async def load_agent(client: httpx.AsyncClient, app_name: str) -> bool:
+    """Make ADK import the agent, and with STARTUP_WARMUP_RUN run one short turn through it."""
+    response = await client.get(f"/apps/{app_name}/app-info")
+    if response.status_code == 404 and not STARTUP_WARMUP_RUN:
+        # Older ADK releases have no app-info endpoint; check the app is listed,
+        # and the first /run loads the agent
+        response = await client.get("/list-apps")
+        return response.status_code == 200 and app_name in response.json()
+    if not STARTUP_WARMUP_RUN:
+        return response.status_code == 200
+
+    user_id = f"warmup-{uuid.uuid4()}"
+    session_id = f"warmup-{uuid.uuid4()}"
+    session_url = f"/apps/{app_name}/users/{user_id}/sessions/{session_id}"
+    await client.post(session_url, json={"state": {}})
+    try:
+        response = await client.post("/run", json={
+            "appName": app_name,
+            "userId": user_id,
+            "sessionId": session_id,
+            "newMessage": {"role": "user", "parts": [{"text": "Reply with OK."}]},
+            "streaming": False,
+        })
+        return response.status_code == 200
+    finally:
+        await client.delete(session_url)
+
+
+async def run_startup(client: httpx.AsyncClient, readiness: Readiness, app_name: str) -> None:
+    """Bring the proxy to ready: wait for ADK, warm the database, load the agent."""
+    started = time.monotonic()
+
+    readiness.adk_ok = await wait_for_adk(client)
+    if not readiness.adk_ok:
+        readiness.last_error = "ADK API server did not become ready"
+
+    readiness.db_ok, db_error = await asyncio.to_thread(check_db)
+    if readiness.db_ok:
+        try:
+            rows = await asyncio.to_thread(warm_db)
+            logger.info("Warmed availability window (%d booked slots)", rows)
+        except Exception as e:
+            logger.warning("Availability warm-up failed: %s", e)
+    else:
+        readiness.last_error = db_error
+
+    if readiness.adk_ok:
+        try:
+            readiness.agent_loaded = await load_agent(client, app_name)
+        except httpx.HTTPError as e:
+            logger.warning("Agent warm-up failed: %s", e)
+
+    readiness.checked_at = time.time()
+    readiness.startup_complete = True
+    logger.info("Startup finished in %.1fs: %s", time.monotonic() - started, readiness.to_dict())
@@ -0,0 +1,40 @@
+"""
+Token bucket rate limiting shared by the proxy's admission control and the
+reminder job.
+"""
+
+import time
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` tokens/second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token; return 0 on success or the seconds until one is available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        """Return a token taken by a request that was rejected later on."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
@@ -0,0 +1,247 @@
+"""
+Lightweight distributed tracing for the SAP Doc ADK service.
+
+A trace starts in the CORS proxy, travels to the ADK API server as a W3C
+``traceparent`` header (and in the session state for ``/run`` requests, since
+that is the only thing agent tools can see), and continues in the agent as
+child spans for the turn, each model call, each tool execution and each SQL
+statement.
+
+Finished spans are appended as JSON lines to ``TRACE_EXPORT_PATH`` using the
+OTLP/JSON field names, so the file can be inspected directly or shipped to a
+collector. Tracing is a no-op apart from id generation when the variable is
+unset.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from turn_state import TurnState
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+# Session state key used to hand the proxy's trace context to the agent
+TRACE_STATE_KEY = "trace:traceparent"
+
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "sap-doc-adk")
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """A single timed operation within a trace."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes",
+                 "status", "start_ns", "end_ns")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "ERROR"
+        self.attributes["error.type"] = type(error).__name__
+        self.attributes["error.message"] = str(error)
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            _exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "resource": {"service.name": SERVICE_NAME, "process.pid": os.getpid()},
+        }
+
+
+class JsonLinesExporter:
+    """Append finished spans to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, span: Span) -> None:
+        if not self.path:
+            return
+        line = json.dumps(span.to_dict(), default=str)
+        try:
+            with self._lock:
+                if self._file is None:
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(line + "\n")
+        except OSError as e:
+            logger.warning("Failed to export span %s: %s", span.name, e)
+
+
+_exporter = JsonLinesExporter(TRACE_EXPORT_PATH)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Return ``(trace_id, parent_span_id)`` from a W3C traceparent header."""
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    return (match.group(1), match.group(2)) if match else None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def new_span(name: str, traceparent: Optional[str] = None, parent: Optional[Span] = None,
+             **attributes: Any) -> Span:
+    """Create a span without making it current.
+
+    The parent is taken from ``parent``, then ``traceparent``, then the
+    current span; a new trace is started if none is available.
+    """
+    parent = parent or (None if traceparent else current_span())
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+    remote = parse_traceparent(traceparent)
+    if remote:
+        return Span(name, remote[0], remote[1], attributes)
+    return Span(name, secrets.token_hex(16), None, attributes)
+
+
+@contextmanager
+def start_span(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+    """Run the enclosed block as the current span."""
+    span = new_span(name, traceparent, **attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+# ADK agent callbacks
+#
+# Turn, model and tool spans start and end in different callbacks, so they are
+# kept in ``_open_spans`` keyed by invocation and closed by the matching
+# "after" callback. Everything left open for an invocation is closed together
+# with its turn span. Spans of turns that never reach their after-agent
+# callback are ended as abandoned once they expire.
+
+def _abandon_span(key: Tuple[str, str], span: Span) -> None:
+    span.status = "ERROR"
+    span.set_attribute("span.abandoned", True)
+    span.end()
+
+
+_open_spans: TurnState[Span] = TurnState(on_evict=_abandon_span)
+
+
+def _end_open_span(key: Tuple[str, str]) -> Optional[Span]:
+    span = _open_spans.pop(key, None)
+    if span is not None:
+        span.end()
+    return span
+
+
+def trace_before_agent(callback_context) -> None:
+    traceparent = callback_context.state.get(TRACE_STATE_KEY)
+    span = new_span("agent.turn", traceparent,
+                    **{"agent.name": callback_context.agent_name,
+                       "session.id": callback_context.session.id})
+    _open_spans[(callback_context.invocation_id, "agent")] = span
+    _current_span.set(span)
+    return None
+
+
+def trace_after_agent(callback_context) -> None:
+    invocation_id = callback_context.invocation_id
+    for key in [k for k in _open_spans if k[0] == invocation_id and k[1] != "agent"]:
+        _end_open_span(key)
+    _end_open_span((invocation_id, "agent"))
+    return None
+
+
+def trace_before_model(callback_context, llm_request) -> None:
+    turn = _open_spans.get((callback_context.invocation_id, "agent"))
+    span = new_span("llm.generate", parent=turn,
+                    **{"llm.model": llm_request.model or "",
+                       "llm.request.contents": len(llm_request.contents or [])})
+    _open_spans[(callback_context.invocation_id, "model")] = span
+    return None
+
+
+def trace_after_model(callback_context, llm_response) -> None:
+    if getattr(llm_response, "partial", False):
+        return None
+    span = _open_spans.get((callback_context.invocation_id, "model"))
+    if span is not None:
+        usage = llm_response.usage_metadata
+        if usage is not None:
+            span.set_attribute("llm.usage.prompt_tokens", usage.prompt_token_count)
+            span.set_attribute("llm.usage.completion_tokens", usage.candidates_token_count)
+        if llm_response.error_code:
+            span.status = "ERROR"
+            span.set_attribute("error.type", str(llm_response.error_code))
+        _end_open_span((callback_context.invocation_id, "model"))
+    return None
+
+
+def trace_before_tool(tool, args, tool_context) -> None:
+    turn = _open_spans.get((tool_context.invocation_id, "agent"))
+    span = new_span("tool.execute", parent=turn,
+                    **{"tool.name": tool.name, "tool.args": sorted(args)})
+    _open_spans[(tool_context.invocation_id, f"tool:{tool_context.function_call_id}")] = span
+    # DB spans opened while the tool runs become children of the tool span
+    _current_span.set(span)
+    return None
+
+
+def trace_after_tool(tool, args, tool_context, tool_response) -> None:
+    key = (tool_context.invocation_id, f"tool:{tool_context.function_call_id}")
+    _end_open_span(key)
+    _current_span.set(_open_spans.get((tool_context.invocation_id, "agent")))
+    return None
@@ -0,0 +1,72 @@
+"""
+Per-invocation state for ADK agent callbacks.
+
+Callbacks that keep state for a turn store it at the turn's first callback and
+drop it in the after-agent callback. ADK does not run after-agent callbacks
+when a turn fails or is cancelled part-way, so ``TurnState`` also evicts
+entries older than ``TURN_STATE_MAX_AGE_SECONDS`` whenever a new one is added.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Iterator, List, Optional, Tuple, TypeVar
+
+TURN_STATE_MAX_AGE_SECONDS = float(os.getenv("TURN_STATE_MAX_AGE_SECONDS", "600"))
+
+V = TypeVar("V")
+
+
+class TurnState(Generic[V]):
+    """Dict-like store whose entries expire ``max_age`` seconds after they were added."""
+
+    def __init__(self, max_age: float = TURN_STATE_MAX_AGE_SECONDS,
+                 on_evict: Optional[Callable[[Hashable, V], None]] = None):
+        self.max_age = max_age
+        self.on_evict = on_evict
+        self.evicted = 0
+        self._items: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __setitem__(self, key: Hashable, value: V) -> None:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items[key] = (entry[0], value)
+                return
+            now = time.monotonic()
+            self._items[key] = (now, value)
+            expired = self._expire(now)
+        for item in expired:
+            if self.on_evict is not None:
+                self.on_evict(*item)
+
+    def _expire(self, now: float) -> List[Tuple[Hashable, V]]:
+        expired = []
+        while self._items:
+            key, (added, value) = next(iter(self._items.items()))
+            if now - added < self.max_age:
+                break
+            del self._items[key]
+            expired.append((key, value))
+        self.evicted += len(expired)
+        return expired
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._items.get(key)
+        return default if entry is None else entry[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._items.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self._items))
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -0,0 +1,217 @@
+"""
+WebSocket chat for the CORS proxy.
+
+A browser opens one WebSocket per ADK session and keeps it for the whole
+conversation, instead of making a CORS-checked HTTP POST per message that
+resends the session identifiers each time. Every user message runs one turn
+through ADK's ``/run_sse`` endpoint, and agent events are pushed to the
+browser as they arrive.
+
+Client -> proxy messages::
+
+    {"type": "message", "text": "What's free on Monday?"}
+    {"type": "pong"}
+
+Proxy -> client messages::
+
+    {"type": "ready", "sessionId": ...}
+    {"type": "partial", "text": ...}                     streamed model text
+    {"type": "tool_call", "name": ..., "args": {...}}
+    {"type": "tool_result", "name": ..., "status": ...}
+    {"type": "message", "author": ..., "text": ...}      a complete model message
+    {"type": "done", "text": ...}                        the turn's final answer
+    {"type": "error", "error": ..., "retryAfter": ...}
+    {"type": "ping"}
+
+Only one turn per connection runs at a time, and each turn goes through the
+proxy's admission control. Outgoing messages go through a queue that holds at
+most ``WS_SEND_QUEUE_SIZE`` messages. When the browser reads too slowly,
+partial text chunks are dropped, since the complete message follows anyway.
+Other events wait for space in the queue, which in turn pauses reading from
+ADK. The proxy sends a ping every ``WS_HEARTBEAT_INTERVAL`` seconds. A
+connection is closed when the client has sent nothing, not even a pong, for
+``WS_IDLE_TIMEOUT`` seconds.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import WebSocket, WebSocketDisconnect
+
+import fast_json
+from admission import AdmissionController, Rejected
+from deadlines import DEADLINE_STATE_KEY, new_turn_deadline, remaining
+from prefetch import PREFETCH_STATE_KEY, AvailabilityPrefetcher
+from tracing import TRACE_STATE_KEY, TRACEPARENT_HEADER, start_span
+
+logger = logging.getLogger(__name__)
+
+WS_HEARTBEAT_INTERVAL = float(os.environ.get("WS_HEARTBEAT_INTERVAL", "20"))
+WS_IDLE_TIMEOUT = float(os.environ.get("WS_IDLE_TIMEOUT", "120"))
+WS_SEND_QUEUE_SIZE = int(os.environ.get("WS_SEND_QUEUE_SIZE", "64"))
+WS_MAX_MESSAGE_CHARS = int(os.environ.get("WS_MAX_MESSAGE_CHARS", "4000"))
+
+# WebSocket close code for "policy violation"
+CLOSE_POLICY_VIOLATION = 1008
+
+
+def translate_event(event: Dict[str, Any]) -> list:
+    """Turn one ADK event into the chat messages pushed to the browser."""
+    if event.get("error") or event.get("errorMessage"):
+        return [{"type": "error", "error": event.get("error") or event.get("errorMessage")}]
+
+    messages = []
+    partial = event.get("partial", False)
+    texts = []
+    for part in (event.get("content") or {}).get("parts") or []:
+        if part.get("text") and not part.get("thought"):
+            texts.append(part["text"])
+        elif part.get("functionCall"):
+            call = part["functionCall"]
+            messages.append({"type": "tool_call", "name": call.get("name"), "args": call.get("args") or {}})
+        elif part.get("functionResponse"):
+            response = part["functionResponse"]
+            result = response.get("response") or {}
+            messages.append({
+                "type": "tool_result",
+                "name": response.get("name"),
+                "status": result.get("status") if isinstance(result, dict) else None,
+            })
+    if texts:
+        text = "".join(texts)
+        if partial:
+            messages.append({"type": "partial", "text": text})
+        else:
+            messages.append({"type": "message", "author": event.get("author"), "text": text})
+    return messages
+
+
+class ChatConnection:
+    """One browser WebSocket bound to one ADK session."""
+
+    def __init__(self, websocket: WebSocket, client: httpx.AsyncClient, admission: AdmissionController,
+                 app_name: str, user_id: str, session_id: str,
+                 prefetcher: Optional[AvailabilityPrefetcher] = None):
+        self.websocket = websocket
+        self.client = client
+        self.admission = admission
+        self.app_name = app_name
+        self.user_id = user_id
+        self.session_id = session_id
+        self.prefetcher = prefetcher
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self._turn: Optional[asyncio.Task] = None
+        self._last_received = time.monotonic()
+        self.dropped_partials = 0
+
+    async def send(self, message: Dict[str, Any]) -> None:
+        """Queue a message for the browser, dropping partial text when it is behind."""
+        if message["type"] == "partial" and self._outbox.full():
+            self.dropped_partials += 1
+            return
+        await self._outbox.put(message)
+
+    async def _sender(self) -> None:
+        while True:
+            message = await self._outbox.get()
+            await self.websocket.send_text(fast_json.dumps(message).decode())
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+            if time.monotonic() - self._last_received > WS_IDLE_TIMEOUT:
+                logger.info("Closing idle WebSocket for session %s", self.session_id)
+                await self.websocket.close(code=CLOSE_POLICY_VIOLATION, reason="idle timeout")
+                return
+            await self.send({"type": "ping"})
+
+    async def _run_turn(self, text: str) -> None:
+        """Run one turn through /run_sse and relay its events until the turn's deadline."""
+        final_text = ""
+        deadline = new_turn_deadline()
+        try:
+            async with self.admission.admit(self.user_id), asyncio.timeout(remaining(deadline)):
+                with start_span("adk.run_sse", **{"session.id": self.session_id, "transport": "websocket"}) as span:
+                    run_request = {
+                        "appName": self.app_name,
+                        "userId": self.user_id,
+                        "sessionId": self.session_id,
+                        "newMessage": {"role": "user", "parts": [{"text": text}]},
+                        "streaming": True,
+                        "stateDelta": {TRACE_STATE_KEY: span.traceparent, DEADLINE_STATE_KEY: deadline},
+                    }
+                    availability = self.prefetcher.take(self.session_id) if self.prefetcher else None
+                    if availability is not None:
+                        run_request["stateDelta"][PREFETCH_STATE_KEY] = availability
+                    async with self.client.stream(
+                        "POST", "/run_sse",
+                        content=fast_json.dumps(run_request),
+                        headers={"Content-Type": "application/json", TRACEPARENT_HEADER: span.traceparent},
+                        timeout=httpx.Timeout(60.0, read=None)
+                    ) as response:
+                        span.set_attribute("http.status_code", response.status_code)
+                        if response.status_code != 200:
+                            body = await response.aread()
+                            await self.send({"type": "error", "error": f"ADK returned {response.status_code}",
+                                             "detail": body.decode(errors="replace")[:500]})
+                            return
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            for message in translate_event(fast_json.loads(line[5:])):
+                                if message["type"] == "message":
+                                    final_text = message["text"]
+                                await self.send(message)
+            await self.send({"type": "done", "text": final_text})
+        except Rejected as e:
+            await self.send({"type": "error", "error": e.reason, "retryAfter": e.retry_after})
+        except TimeoutError:
+            await self.send({"type": "error", "error": "The request took too long to complete. Please try again."})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("WebSocket turn failed for session %s: %s", self.session_id, e)
+            await self.send({"type": "error", "error": str(e)})
+
+    async def _handle(self, raw: str) -> None:
+        try:
+            message = fast_json.loads(raw)
+        except ValueError:
+            await self.send({"type": "error", "error": "Messages must be JSON"})
+            return
+        kind = message.get("type") if isinstance(message, dict) else None
+        if kind == "pong":
+            return
+        if kind != "message" or not isinstance(message.get("text"), str) or not message["text"].strip():
+            await self.send({"type": "error", "error": "Expected {\"type\": \"message\", \"text\": ...}"})
+            return
+        if len(message["text"]) > WS_MAX_MESSAGE_CHARS:
+            await self.send({"type": "error", "error": "Message is too long"})
+            return
+        if self._turn is not None and not self._turn.done():
+            await self.send({"type": "error", "error": "A turn is already in progress"})
+            return
+        self._turn = asyncio.create_task(self._run_turn(message["text"]))
+
+    async def serve(self) -> None:
+        """Accept the socket and serve it until the client disconnects."""
+        await self.websocket.accept()
+        sender = asyncio.create_task(self._sender())
+        heartbeat = asyncio.create_task(self._heartbeat())
+        await self.send({"type": "ready", "sessionId": self.session_id})
+        try:
+            while True:
+                raw = await self.websocket.receive_text()
+                self._last_received = time.monotonic()
+                await self._handle(raw)
+        except (WebSocketDisconnect, RuntimeError):
+            # RuntimeError: the heartbeat closed the socket under receive_text
+            pass
+        finally:
+            for task in (self._turn, heartbeat, sender):
+                if task is not None:
+                    task.cancel()
@@ -2,17 +2,21 @@ import pool from './db.js';
 
 const createTables = async () => {
   try {
-    // Create appointments table (only for actual bookings)
+    // Create appointments table (only for actual bookings).
+    // Keys include date so adk-service/partitions.py can partition the table by
+    // month; slot lookups must filter on date as well as slot_id.
     await pool.query(`
       CREATE TABLE IF NOT EXISTS appointments (
-        id SERIAL PRIMARY KEY,
-        slot_id VARCHAR(255) UNIQUE NOT NULL,
+        id SERIAL,
+        slot_id VARCHAR(255) NOT NULL,
         time VARCHAR(10) NOT NULL,
         date DATE NOT NULL,
         patient_name VARCHAR(255) NOT NULL,
         description TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT appointments_pkey PRIMARY KEY (id, date),
+        CONSTRAINT appointments_slot_id_date_key UNIQUE (slot_id, date)
       );
     `);
 
@@ -21,12 +25,49 @@ const createTables = async () => {
       CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments(date);
     `);
 
+    // Patient lookups by name: prefix matches use the btree index
+    await pool.query(`
+      CREATE INDEX IF NOT EXISTS idx_appointments_patient_name ON appointments(lower(patient_name) text_pattern_ops, date);
+    `);
+
+    // Short-lived holds on slots a patient is confirming with the agent
+    await pool.query(`
+      CREATE TABLE IF NOT EXISTS slot_holds (
+        slot_id VARCHAR(255) PRIMARY KEY,
+        date DATE NOT NULL,
+        session_id VARCHAR(255) NOT NULL,
+        expires_at TIMESTAMPTZ NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+      );
+    `);
+
+    await pool.query(`
+      CREATE INDEX IF NOT EXISTS idx_slot_holds_date ON slot_holds(date, expires_at);
+    `);
+
+    await pool.query(`
+      CREATE INDEX IF NOT EXISTS idx_slot_holds_session ON slot_holds(session_id);
+    `);
+
     console.log('Tables created successfully');
   } catch (error) {
     console.error('Error creating tables:', error);
   }
 };
 
+const createSearchIndexes = async () => {
+  try {
+    // Fuzzy patient name matching needs pg_trgm, which may require extra privileges
+    await pool.query('CREATE EXTENSION IF NOT EXISTS pg_trgm');
+    await pool.query(`
+      CREATE INDEX IF NOT EXISTS idx_appointments_patient_name_trgm ON appointments USING gin (lower(patient_name) gin_trgm_ops);
+    `);
+    console.log('Search indexes created successfully');
+  } catch (error) {
+    console.error('Error creating search indexes (fuzzy patient search will fall back to a scan):', error);
+  }
+};
+
 const seedData = async () => {
   try {
     // Check if sample appointments already exist
@@ -69,6 +110,7 @@ const seedData = async () => {
 
 const migrate = async () => {
   await createTables();
+  await createSearchIndexes();
   await seedData();
   process.exit(0);
 };
@@ -4,6 +4,20 @@ import pool from '../database/db.js';
 
 const router = express.Router();
 
+// Parse a slot ID (format: YYYY-MM-DD-HH:MM) into its date and time.
+// Appointments are unique per (slot_id, date) and the table may be partitioned
+// by date, so slot lookups filter on both.
+const parseSlotId = (slotId) => {
+  const match = /^(\d{4}-\d{2}-\d{2})-(\d{2}:\d{2})$/.exec(slotId);
+  if (!match || Number.isNaN(Date.parse(match[1]))) {
+    return null;
+  }
+  return { date: match[1], time: match[2] };
+};
+
+// Slots held by the ADK agent for a patient who is confirming a booking
+const ACTIVE_HOLD_CONDITION = 'expires_at > now()';
+
 // Get all time slots for a specific date range (dynamic generation + bookings)
 router.get('/slots', async (req, res) => {
   try {
@@ -27,6 +41,13 @@ router.get('/slots', async (req, res) => {
     `;
     const appointments = await pool.query(appointmentQuery, [start, end]);
     
+    // Get slots held by the agent in the date range
+    const holds = await pool.query(
+      `SELECT slot_id FROM slot_holds WHERE date BETWEEN $1 AND $2 AND ${ACTIVE_HOLD_CONDITION}`,
+      [start, end]
+    );
+    const heldSlots = new Set(holds.rows.map(hold => hold.slot_id));
+    
     // Create a map of existing appointments by slot_id
     const appointmentMap = new Map();
     appointments.rows.forEach(appointment => {
@@ -55,6 +76,7 @@ router.get('/slots', async (req, res) => {
           time,
           date: dateString,
           isBooked: !!appointment,
+          isHeld: !appointment && heldSlots.has(slotId),
           patientName: appointment?.patient_name || undefined,
           description: appointment?.description || undefined
         });
@@ -75,21 +97,26 @@ router.get('/slots', async (req, res) => {
 router.get('/slots/:slotId', async (req, res) => {
   try {
     const { slotId } = req.params;
+    const slot = parseSlotId(slotId);
+    if (!slot) {
+      return res.status(400).json({ error: 'Invalid slot ID' });
+    }
     
     // Check if there's an appointment for this slot
-    const result = await pool.query('SELECT * FROM appointments WHERE slot_id = $1', [slotId]);
+    const result = await pool.query('SELECT * FROM appointments WHERE slot_id = $1 AND date = $2', [slotId, slot.date]);
     
     if (result.rows.length === 0) {
       // No appointment exists, return empty slot
-      // Format: YYYY-MM-DD-HH:MM
-      const parts = slotId.split('-');
-      const date = `${parts[0]}-${parts[1]}-${parts[2]}`;
-      const time = parts[3];
+      const hold = await pool.query(
+        `SELECT 1 FROM slot_holds WHERE slot_id = $1 AND ${ACTIVE_HOLD_CONDITION}`,
+        [slotId]
+      );
       return res.json({
         id: slotId,
-        time,
-        date,
+        time: slot.time,
+        date: slot.date,
         isBooked: false,
+        isHeld: hold.rows.length > 0,
         patientName: undefined,
         description: undefined
       });
@@ -127,27 +154,30 @@ router.post('/slots/:slotId/book', [
     const { patientName, description } = req.body;
     
     // Parse slot_id to get date and time
-    // Format: YYYY-MM-DD-HH:MM
-    const parts = slotId.split('-');
-    // Reconstruct the date from the first 3 parts
-    const dateString = `${parts[0]}-${parts[1]}-${parts[2]}`;
-    // Get the time from the last part
-    const time = parts[3];
-    const date = new Date(dateString);
-    
-    // Check if appointment already exists
-    const existingAppointment = await pool.query('SELECT * FROM appointments WHERE slot_id = $1', [slotId]);
-    
-    if (existingAppointment.rows.length > 0) {
-      return res.status(400).json({ error: 'Slot is already booked' });
+    const slot = parseSlotId(slotId);
+    if (!slot) {
+      return res.status(400).json({ error: 'Invalid slot ID' });
     }
+    const { time } = slot;
+    const date = new Date(slot.date);
     
-    // Create new appointment
+    // Create new appointment unless the slot is booked or held; checking and
+    // inserting in one statement keeps a hold placed meanwhile from being missed
     const result = await pool.query(
-      'INSERT INTO appointments (slot_id, time, date, patient_name, description) VALUES ($1, $2, $3, $4, $5) RETURNING *',
+      `INSERT INTO appointments (slot_id, time, date, patient_name, description)
+       SELECT $1, $2, $3, $4, $5
+       WHERE NOT EXISTS (SELECT 1 FROM slot_holds WHERE slot_id = $1 AND ${ACTIVE_HOLD_CONDITION})
+       ON CONFLICT DO NOTHING
+       RETURNING *`,
       [slotId, time, date, patientName, description]
     );
     
+    if (result.rows.length === 0) {
+      const existingAppointment = await pool.query('SELECT 1 FROM appointments WHERE slot_id = $1 AND date = $2', [slotId, slot.date]);
+      const error = existingAppointment.rows.length > 0 ? 'Slot is already booked' : 'Slot is being held for another patient';
+      return res.status(400).json({ error });
+    }
+    
     const appointment = result.rows[0];
     const responseDateString = appointment.date.toISOString().split('T')[0];
     
@@ -170,27 +200,25 @@ router.post('/slots/:slotId/book', [
 router.delete('/slots/:slotId/book', async (req, res) => {
   try {
     const { slotId } = req.params;
+    const slot = parseSlotId(slotId);
+    if (!slot) {
+      return res.status(404).json({ error: 'Appointment not found' });
+    }
     
     // Check if appointment exists
-    const existingAppointment = await pool.query('SELECT * FROM appointments WHERE slot_id = $1', [slotId]);
+    const existingAppointment = await pool.query('SELECT * FROM appointments WHERE slot_id = $1 AND date = $2', [slotId, slot.date]);
     
     if (existingAppointment.rows.length === 0) {
       return res.status(404).json({ error: 'Appointment not found' });
     }
     
     // Delete the appointment
-    await pool.query('DELETE FROM appointments WHERE slot_id = $1', [slotId]);
-    
-    // Parse slot_id to return slot info
-    // Format: YYYY-MM-DD-HH:MM
-    const parts = slotId.split('-');
-    const dateString = `${parts[0]}-${parts[1]}-${parts[2]}`;
-    const time = parts[3];
+    await pool.query('DELETE FROM appointments WHERE slot_id = $1 AND date = $2', [slotId, slot.date]);
     
     res.json({
       id: slotId,
-      time,
-      date: dateString,
+      time: slot.time,
+      date: slot.date,
       isBooked: false,
       patientName: undefined,
       description: undefined,
@@ -8,8 +8,10 @@ interface TimeSlotProps {
 }
 
 export function TimeSlot({ slot, onClick, className }: TimeSlotProps) {
+  const unavailable = slot.isBooked || !!slot.isHeld;
+
   const handleClick = () => {
-    if (!slot.isBooked) {
+    if (!unavailable) {
       onClick(slot);
     }
   };
@@ -17,11 +19,11 @@ export function TimeSlot({ slot, onClick, className }: TimeSlotProps) {
   return (
     <button
       onClick={handleClick}
-      disabled={slot.isBooked}
+      disabled={unavailable}
       className={cn(
         "p-3 text-sm font-medium rounded-lg border transition-all duration-200",
         "hover:shadow-sm focus:outline-none focus:ring-2 focus:ring-gray-400 focus:ring-offset-1",
-        slot.isBooked
+        unavailable
           ? "bg-gray-100 text-gray-400 border-gray-200 cursor-not-allowed"
           : "bg-white text-gray-700 border-gray-300 hover:border-gray-400 hover:bg-gray-50 cursor-pointer",
         className
@@ -32,6 +34,9 @@ export function TimeSlot({ slot, onClick, className }: TimeSlotProps) {
         {slot.isBooked && (
           <span className="text-xs text-gray-400">Booked</span>
         )}
+        {slot.isHeld && (
+          <span className="text-xs text-gray-400">Held</span>
+        )}
       </div>
     </button>
   );
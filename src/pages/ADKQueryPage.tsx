@@ -17,6 +17,11 @@ export function ADKQueryPage() {
     sessionId: string;
     appName: string;
   } | null>(null);
+  // Last message sent without getting a response, with its Idempotency-Key
+  const [pendingMessage, setPendingMessage] = useState<{
+    text: string;
+    idempotencyKey: string;
+  } | null>(null);
   const { toast } = useToast();
 
   // Create session when component mounts
@@ -100,11 +105,20 @@ export function ADKQueryPage() {
       // Use the existing session info
       const { userId, sessionId, appName } = sessionInfo;
 
+      // Resending a message that got no response reuses its key, so the proxy
+      // replays the first response instead of running the turn again
+      const message =
+        pendingMessage && pendingMessage.text === query
+          ? pendingMessage
+          : { text: query, idempotencyKey: crypto.randomUUID() };
+      setPendingMessage(message);
+
       // Process the query with our Google ADK Python service through the CORS proxy
       const response = await fetch("http://localhost:8001/run", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "Idempotency-Key": message.idempotencyKey,
         },
         body: JSON.stringify({
           appName: appName,
@@ -123,6 +137,7 @@ export function ADKQueryPage() {
       }
 
       const data = await response.json();
+      setPendingMessage(null);
 
       // Extract response from ADK API response format
       // The ADK API can return different formats depending on the response type
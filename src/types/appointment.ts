@@ -3,6 +3,8 @@ export interface TimeSlot {
   time: string;
   date: string;
   isBooked: boolean;
+  // Held by the ADK agent while another patient confirms a booking
+  isHeld?: boolean;
   patientName?: string;
   description?: string;
 }